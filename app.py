@@ -29,6 +29,7 @@ from werkzeug.utils import secure_filename
 
 # Import AI table reader for smart file preview
 from utils.ai_table_reader import AITableReader
+from utils.ai_explainer import is_fallback_text
 
 app = Flask(__name__)
 
@@ -43,6 +44,13 @@ app.config['UPLOAD_FOLDER'] = tempfile.gettempdir()
 RESULTS_DIR = Path(__file__).parent / 'data' / 'results'
 RESULTS_DIR.mkdir(parents=True, exist_ok=True)
 
+# Cache of se-cli analysis output, keyed by file content + parameters, so that
+# re-uploading the same file skips the subprocess, price fetch and AI call
+ANALYSIS_CACHE_DIR = Path(__file__).parent / 'data' / 'cache' / 'analysis'
+ANALYSIS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+ANALYSIS_CACHE_TTL = 24 * 3600  # seconds
+ANALYSIS_CACHE_MAX_ENTRIES = 200
+
 # Rate limiting: 4 analyses per hour per IP
 RATE_LIMIT_MAX = 4
 RATE_LIMIT_WINDOW = 3600  # 1 hour in seconds
@@ -115,6 +123,66 @@ def load_result(result_id: str) -> dict | None:
     with open(file_path, 'r', encoding='utf-8') as f:
         return json.load(f)
 
+
+def analysis_cache_key(file_path: str, area: str, currency: str, ai_enabled: bool) -> str:
+    """Key a CLI analysis by file content and the parameters passed to se-cli."""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    digest.update(f"|{area}|{currency}|{int(ai_enabled)}".encode())
+    return digest.hexdigest()
+
+
+def load_cached_analysis(key: str) -> dict | None:
+    """Return a cached CLI analysis if it is younger than ANALYSIS_CACHE_TTL."""
+    file_path = ANALYSIS_CACHE_DIR / f"{key}.json"
+    try:
+        if time.time() - file_path.stat().st_mtime > ANALYSIS_CACHE_TTL:
+            file_path.unlink(missing_ok=True)
+            return None
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def store_cached_analysis(key: str, data: dict) -> None:
+    """Cache a CLI analysis; written via a temp file so readers never see partial JSON.
+
+    Results whose AI explanation failed (error or manual fallback) are not
+    cached, so a transient timeout or rate limit isn't served for a day.
+    """
+    if 'ai_explanation_sv_error' in data or is_fallback_text(data.get('ai_explanation_sv')):
+        return
+    file_path = ANALYSIS_CACHE_DIR / f"{key}.json"
+    tmp_path = file_path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, file_path)
+    except OSError:
+        pass  # Caching is best-effort
+    sweep_analysis_cache()
+
+
+def sweep_analysis_cache() -> None:
+    """Remove expired cache files and cap the directory at ANALYSIS_CACHE_MAX_ENTRIES."""
+    entries = []
+    for path in ANALYSIS_CACHE_DIR.glob('*.json'):
+        try:
+            entries.append((path.stat().st_mtime, path))
+        except OSError:
+            continue  # Removed by another worker
+    entries.sort(reverse=True)
+    cutoff = time.time() - ANALYSIS_CACHE_TTL
+    for i, (mtime, path) in enumerate(entries):
+        if i >= ANALYSIS_CACHE_MAX_ENTRIES or mtime < cutoff:
+            try:
+                path.unlink(missing_ok=True)
+            except OSError:
+                pass
+
 @app.route('/')
 def index():
     """API root - return service info."""
@@ -156,36 +224,42 @@ def analyze():
         file.save(file_path)
 
         try:
-            # Build CLI command
-            cmd = [
-                'uv', 'run', 'se-cli', 'analyze',
-                file_path,
-                '--area', area,
-                '--currency', currency,
-                '--json'
-            ]
+            cache_key = analysis_cache_key(file_path, area, currency, has_openai_key)
+            analysis_data = load_cached_analysis(cache_key)
+
+            if analysis_data is None:
+                # Build CLI command
+                cmd = [
+                    'uv', 'run', 'se-cli', 'analyze',
+                    file_path,
+                    '--area', area,
+                    '--currency', currency,
+                    '--json'
+                ]
+
+                # Add AI explainer only if OpenAI key is available
+                if has_openai_key:
+                    cmd.append('--ai-explainer')
 
-            # Add AI explainer only if OpenAI key is available
-            if has_openai_key:
-                cmd.append('--ai-explainer')
+                # Run the CLI command
+                result = subprocess.run(
+                    cmd,
+                    capture_output=True,
+                    text=True,
+                    timeout=300  # 5 minute timeout
+                )
 
-            # Run the CLI command
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=300  # 5 minute timeout
-            )
+                if result.returncode != 0:
+                    error_msg = result.stderr or result.stdout or 'Analysis failed'
+                    return jsonify({'error': f'Analysis error: {error_msg}'}), 500
 
-            if result.returncode != 0:
-                error_msg = result.stderr or result.stdout or 'Analysis failed'
-                return jsonify({'error': f'Analysis error: {error_msg}'}), 500
+                # Parse JSON output from CLI
+                try:
+                    analysis_data = json.loads(result.stdout)
+                except json.JSONDecodeError as e:
+                    return jsonify({'error': f'Failed to parse analysis results: {str(e)}'}), 500
 
-            # Parse JSON output from CLI
-            try:
-                analysis_data = json.loads(result.stdout)
-            except json.JSONDecodeError as e:
-                return jsonify({'error': f'Failed to parse analysis results: {str(e)}'}), 500
+                store_cached_analysis(cache_key, analysis_data)
 
             # Format response
             response = {
@@ -498,8 +572,15 @@ def analyze_stream():
             if has_openai_key:
                 cmd.append('--ai-explainer')
 
+            cache_key = analysis_cache_key(file_path, area, currency, has_openai_key)
+            analysis_data = load_cached_analysis(cache_key)
+            from_cache = analysis_data is not None
+
+            if from_cache:
+                yield f"data: {json.dumps({'type': 'info', 'message': 'Samma fil har analyserats nyligen - återanvänder resultatet'})}\n\n"
+
             # If we need AI parsing, run it first and wait for result
-            if needs_ai_parsing:
+            elif needs_ai_parsing:
                 yield f"data: {json.dumps({'type': 'ai', 'message': 'Aktiverar AI-assisterad filanalys...'})}\n\n"
                 yield f"data: {json.dumps({'type': 'info', 'message': f'Kolumner att analysera: {cols_list}'})}\n\n"
                 time.sleep(0.2)
@@ -585,6 +666,9 @@ def analyze_stream():
                         yield f"data: {json.dumps({'type': 'info', 'message': f'stderr: {stderr[:300]}'})}\n\n"
                     return
 
+            if not from_cache:
+                store_cached_analysis(cache_key, analysis_data)
+
             # Show some results in log
             hero = analysis_data.get('hero', {})
             produktion = hero.get('produktion', {})
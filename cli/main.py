@@ -1152,8 +1152,8 @@ def main():
                                                     battery_decision_basis=args.battery_decision_basis)
                 if args.ai_explainer:
                     try:
-                        from utils.ai_explainer import AIExplainer
-                        explainer = AIExplainer()
+                        from utils.ai_explainer import get_explainer
+                        explainer = get_explainer()
                         payload['ai_explanation_sv'] = explainer.explain_storytelling(payload)
                     except Exception as e:
                         payload['ai_explanation_sv_error'] = str(e)
@@ -1301,8 +1301,8 @@ def main():
                 from json import dumps as _dumps
                 if args.ai_explainer and json_payload is not None:
                     try:
-                        from utils.ai_explainer import AIExplainer
-                        explainer = AIExplainer()
+                        from utils.ai_explainer import get_explainer
+                        explainer = get_explainer()
                         json_payload['ai_explanation_sv'] = explainer.explain_storytelling(json_payload)
                     except Exception as e:
                         json_payload['ai_explanation_sv_error'] = str(e)
@@ -1,4 +1,6 @@
 import sqlite3
+import threading
+import numpy as np
 import pandas as pd
 from pathlib import Path
 import logging
@@ -9,10 +11,15 @@ class PriceDatabaseManager:
     def __init__(self, db_path='data/price_data.db'):
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(exist_ok=True)
+        # Serialize writes so concurrent fetches don't hit "database is locked"
+        self._write_lock = threading.Lock()
         self._create_tables()
     
     def _create_tables(self):
         with sqlite3.connect(self.db_path) as conn:
+            # WAL is persistent in the database file: readers no longer block
+            # the writer and each commit appends instead of rewriting pages.
+            conn.execute('PRAGMA journal_mode=WAL')
             conn.execute('''
                 CREATE TABLE IF NOT EXISTS price_data (
                     datetime TEXT,
@@ -28,12 +35,13 @@ class PriceDatabaseManager:
         """Upsert price data into database for given area_code."""
         if df is None or df.empty:
             return
-        rows = [
-            (pd.Timestamp(idx).strftime('%Y-%m-%d %H:%M:%S'), area_code, float(val))
-            for idx, val in df['price_eur_per_mwh'].items()
-            if pd.notna(val)
-        ]
-        with sqlite3.connect(self.db_path) as conn:
+        values = df['price_eur_per_mwh'].to_numpy(dtype=float)
+        keep = ~np.isnan(values)
+        timestamps = pd.DatetimeIndex(df.index)[keep].strftime('%Y-%m-%d %H:%M:%S')
+        rows = list(zip(timestamps, [area_code] * int(keep.sum()), values[keep].tolist()))
+        with self._write_lock, sqlite3.connect(self.db_path) as conn:
+            # Safe under WAL: only the last commits can be lost on power failure
+            conn.execute('PRAGMA synchronous=NORMAL')
             conn.executemany(
                 """
                 INSERT INTO price_data (datetime, area_code, price_eur_per_mwh)
@@ -63,7 +71,8 @@ class PriceDatabaseManager:
                     pd.Timestamp(start_date).strftime('%Y-%m-%d %H:%M:%S'),
                     pd.Timestamp(end_date).strftime('%Y-%m-%d %H:%M:%S'),
                 ],
-                parse_dates=['datetime'],
+                # Stored with a fixed format (see store_price_data), so skip inference
+                parse_dates={'datetime': {'format': '%Y-%m-%d %H:%M:%S'}},
                 index_col='datetime',
             )
         
@@ -2,149 +2,6 @@
 import pandas as pd
 import numpy as np
 import logging
-
-logger = logging.getLogger(__name__)
-
-class PriceAnalyzer:
-    def __init__(self):
-        pass
-    
-    def merge_data(self, prices_df, production_df, currency_rate=11.5):
-        """Merge price and production data on datetime index."""
-        # Ensure both dataframes have datetime index
-        if not isinstance(prices_df.index, pd.DatetimeIndex):
-            prices_df.index = pd.to_datetime(prices_df.index)
-        if not isinstance(production_df.index, pd.DatetimeIndex):
-            production_df.index = pd.to_datetime(production_df.index)
-        
-        # Merge on datetime index
-        merged_df = pd.merge(
-            prices_df, production_df,
-            left_index=True, right_index=True,
-            how='inner'
-        )
-        
-        # Calculate derived columns
-        merged_df['price_sek_per_kwh'] = merged_df['price_eur_per_mwh'] * currency_rate / 1000
-        merged_df['export_value_sek'] = merged_df['production_kwh'] * merged_df['price_sek_per_kwh']
-        
-        logger.info(f"Merged data: {len(merged_df)} records from {merged_df.index.min()} to {merged_df.index.max()}")
-        
-        return merged_df
-    
-    def analyze_data(self, merged_df):
-        """Perform comprehensive analysis on merged data."""
-        analysis = {}
-        
-        # Basic statistics
-        analysis['period_days'] = (merged_df.index.max() - merged_df.index.min()).days + 1
-        analysis['total_hours'] = len(merged_df)
-        
-        # Price statistics
-        analysis['price_min_eur_mwh'] = merged_df['price_eur_per_mwh'].min()
-        analysis['price_max_eur_mwh'] = merged_df['price_eur_per_mwh'].max()
-        analysis['price_mean_eur_mwh'] = merged_df['price_eur_per_mwh'].mean()
-        analysis['price_median_eur_mwh'] = merged_df['price_eur_per_mwh'].median()
-        
-        # Production statistics
-        analysis['production_total'] = merged_df['production_kwh'].sum()
-        analysis['production_mean'] = merged_df['production_kwh'].mean()
-        analysis['production_max'] = merged_df['production_kwh'].max()
-        analysis['hours_with_production'] = (merged_df['production_kwh'] > 0).sum()
-        
-        # Negative price analysis
-        negative_mask = merged_df['price_eur_per_mwh'] < 0
-        analysis['negative_price_hours'] = negative_mask.sum()
-        
-        if analysis['negative_price_hours'] > 0:
-            negative_production_mask = negative_mask & (merged_df['production_kwh'] > 0)
-            analysis['production_during_negative_prices'] = merged_df.loc[negative_production_mask, 'production_kwh'].sum()
-            analysis['avg_production_during_negative_prices'] = merged_df.loc[negative_production_mask, 'production_kwh'].mean()
-            analysis['negative_export_cost_abs_sek'] = abs(merged_df.loc[negative_mask, 'export_value_sek'].sum())
-        else:
-            analysis['production_during_negative_prices'] = 0
-            analysis['avg_production_during_negative_prices'] = 0
-            analysis['negative_export_cost_abs_sek'] = 0
-        
-        # Export value analysis
-        analysis['total_export_value_sek'] = merged_df['export_value_sek'].sum()
-        positive_mask = merged_df['price_eur_per_mwh'] > 0
-        analysis['positive_export_value_sek'] = merged_df.loc[positive_mask, 'export_value_sek'].sum()
-        
-        # Time series data for charts
-        analysis['time_series'] = {
-            'timestamps': merged_df.index.strftime('%Y-%m-%d %H:%M').tolist(),
-            'prices_eur_mwh': merged_df['price_eur_per_mwh'].tolist(),
-            'production_kwh': merged_df['production_kwh'].tolist(),
-            'export_values_sek': merged_df['export_value_sek'].tolist()
-        }
-        
-        # Daily summary
-        daily_summary = self.get_daily_summary(merged_df)
-        analysis['daily_series'] = {
-            'dates': daily_summary.index.strftime('%Y-%m-%d').tolist(),
-            'daily_production': daily_summary['production_kwh_sum'].tolist(),
-            'daily_export_value': daily_summary['export_value_sek_sum'].tolist(),
-            'daily_avg_price': daily_summary['price_sek_per_kwh_mean'].tolist()
-        }
-        
-        return analysis
-    
-    def get_daily_summary(self, merged_df):
-        """Get daily summary statistics."""
-        daily_summary = merged_df.resample('D').agg({
-            'production_kwh': ['sum', 'mean', 'max'],
-            'price_sek_per_kwh': ['mean', 'min', 'max'],
-            'export_value_sek': ['sum', 'mean']
-        })
-        
-        # Flatten column names
-        daily_summary.columns = [f"{col[0]}_{col[1]}" for col in daily_summary.columns]
-        
-        return daily_summary
-    
-    def analyze_negative_prices(self, merged_df):
-        """Detailed analysis of negative price periods."""
-        negative_mask = merged_df['price_eur_per_mwh'] < 0
-        negative_df = merged_df[negative_mask].copy()
-        
-        if negative_df.empty:
-            return {
-                'has_negative_prices': False,
-                'message': 'No negative prices found in the dataset'
-            }
-        
-        # Find consecutive negative periods
-        negative_df['date'] = negative_df.index.date
-        negative_df['hour'] = negative_df.index.hour
-        
-        # Group by date
-        daily_negative = negative_df.groupby('date').agg({
-            'production_kwh': 'sum',
-            'export_value_sek': 'sum',
-            'price_eur_per_mwh': ['min', 'mean']
-        })
-        
-        # Monthly breakdown
-        negative_df['month'] = negative_df.index.to_period('M')
-        monthly_negative = negative_df.groupby('month').agg({
-            'production_kwh': 'sum',
-            'export_value_sek': 'sum'
-        })
-        
-        return {
-            'has_negative_prices': True,
-            'total_negative_hours': len(negative_df),
-            'total_cost_sek': abs(negative_df['export_value_sek'].sum()),
-            'average_negative_price_eur_mwh': negative_df['price_eur_per_mwh'].mean(),
-            'lowest_price_eur_mwh': negative_df['price_eur_per_mwh'].min(),
-            'daily_breakdown': daily_negative,
-            'monthly_breakdown': monthly_negative,
-            'most_expensive_hours': negative_df.nsmallest(10, 'export_value_sek')
-        }
-
-import pandas as pd
-import logging
 from typing import Dict, Any
 
 # Configure logging
@@ -179,10 +36,12 @@ class PriceAnalyzer:
         # Calculate export value/cost for each hour
         merged_df['export_value_sek'] = merged_df['production_kwh'] * merged_df['price_sek_per_kwh']
         
-        # Add daily aggregations
-        merged_df['production_daily'] = merged_df.groupby(merged_df.index.date)['production_kwh'].transform('sum')
-        merged_df['price_daily_avg'] = merged_df.groupby(merged_df.index.date)['price_eur_per_mwh'].transform('mean')
-        merged_df['export_value_daily_sek'] = merged_df.groupby(merged_df.index.date)['export_value_sek'].transform('sum')
+        # Add daily aggregations (one grouping on the normalized index instead of
+        # building Python date objects for every row, three times over)
+        daily = merged_df.groupby(merged_df.index.normalize())
+        merged_df['production_daily'] = daily['production_kwh'].transform('sum')
+        merged_df['price_daily_avg'] = daily['price_eur_per_mwh'].transform('mean')
+        merged_df['export_value_daily_sek'] = daily['export_value_sek'].transform('sum')
         
         logger.info(f"Merged data: {len(merged_df)} rows from {merged_df.index.min()} to {merged_df.index.max()}")
         
@@ -232,8 +91,10 @@ class PriceAnalyzer:
             'daily_export_value': daily_data['export_value_sek'].tolist()
         }
         
-        # Negative pricing insights
-        negative_periods = merged_df[merged_df['price_eur_per_mwh'] < 0]
+        # Negative pricing insights. The mask and the negative subset are
+        # computed once and shared by the timeline and the statistics below.
+        negative_mask = merged_df['price_eur_per_mwh'].to_numpy() < 0
+        negative_periods = merged_df[negative_mask]
         if len(negative_periods) > 0:
             analysis['negative_price_timeline'] = {
                 'timestamps': [dt.isoformat() for dt in negative_periods.index],
@@ -263,11 +124,11 @@ class PriceAnalyzer:
         analysis['hours_with_production'] = (merged_df['production_kwh'] > 0).sum()
         
         # Negative price analysis (Enhanced)
-        negative_prices = merged_df[merged_df['price_eur_per_mwh'] < 0]
+        negative_prices = negative_periods
         analysis['negative_price_hours'] = len(negative_prices)
         analysis['production_during_negative_prices'] = negative_prices['production_kwh'].sum()
         analysis['negative_export_cost_sek'] = negative_prices['export_value_sek'].sum()  # This will be negative
-        analysis['negative_export_cost_abs_sek'] = abs(negative_prices['export_value_sek'].sum())  # Absolute cost
+        analysis['negative_export_cost_abs_sek'] = abs(analysis['negative_export_cost_sek'])  # Absolute cost
         
         # Enhanced negative pricing metrics
         analysis['negative_price_percentage'] = (len(negative_prices) / len(merged_df)) * 100 if len(merged_df) > 0 else 0
@@ -295,7 +156,10 @@ class PriceAnalyzer:
         
         # Total export value
         analysis['total_export_value_sek'] = merged_df['export_value_sek'].sum()
-        analysis['positive_export_value_sek'] = merged_df[merged_df['price_eur_per_mwh'] > 0]['export_value_sek'].sum()
+        # Reduce directly over the arrays instead of boolean-indexing the whole frame
+        analysis['positive_export_value_sek'] = np.nansum(
+            merged_df['export_value_sek'].to_numpy(), where=merged_df['price_eur_per_mwh'].to_numpy() > 0
+        )
         
         # Correlation analysis
         if merged_df['production_kwh'].var() > 0 and merged_df['price_sek_per_kwh'].var() > 0:
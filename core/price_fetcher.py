@@ -4,6 +4,9 @@ import os
 from .db_manager import PriceDatabaseManager
 import logging
 from typing import Optional
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 logger = logging.getLogger(__name__)
 
@@ -35,18 +38,45 @@ class PriceFetcher:
         'SE4': '10Y1001A1001A47J',
     }
 
+    # Market timezone, resolved once through pandas so it is the same tzinfo
+    # type pandas itself would produce for the string
+    TZ = pd.Timestamp('2000-01-01', tz='Europe/Stockholm').tz
+
+    # Seconds before an ENTSO-E request is abandoned (entsoe-py has no default)
+    REQUEST_TIMEOUT = 30
+
     def __init__(self, db_path='data/price_data.db'):
         self.db_manager = PriceDatabaseManager(db_path)
         self.entsoe_client = None
         entsoe_key = os.getenv('ENTSOE_API_KEY')
         if ENTSOE_AVAILABLE and entsoe_key:
-            self.entsoe_client = EntsoePandasClient(api_key=entsoe_key)
+            self.entsoe_client = EntsoePandasClient(
+                api_key=entsoe_key,
+                session=self._build_session(),
+                timeout=self.REQUEST_TIMEOUT,
+            )
             logger.info("ENTSO-E client initialized with API key")
         elif not ENTSOE_AVAILABLE:
             logger.error("entsoe-py not installed - price fetching will not work")
         else:
             logger.error("ENTSOE_API_KEY not set - price fetching will not work")
 
+    def _build_session(self) -> requests.Session:
+        """Session shared by all ENTSO-E requests from this fetcher.
+
+        The pool is sized so that one connection per zone can stay open when
+        zones are fetched concurrently, and dropped connections are retried at
+        the transport level before entsoe-py's own (slow) retry kicks in.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=len(self.ENTSOE_ZONE_MAP),
+            max_retries=Retry(total=3, connect=3, read=0, backoff_factor=0.3, allowed_methods=['GET']),
+        )
+        session.mount('https://', adapter)
+        return session
+
     def get_price_data(self, area_code, start_date, end_date, force_api: bool = False):
         """Get price data for area and date range, fetching from ENTSO-E if needed.
 
@@ -99,8 +129,8 @@ class PriceFetcher:
 
         try:
             # ENTSO-E requires timezone-aware timestamps
-            start_tz = start.tz_localize('Europe/Stockholm') if start.tzinfo is None else start
-            end_tz = end.tz_localize('Europe/Stockholm') if end.tzinfo is None else end
+            start_tz = start.tz_localize(self.TZ) if start.tzinfo is None else start
+            end_tz = end.tz_localize(self.TZ) if end.tzinfo is None else end
 
             logger.info(f"Fetching from ENTSO-E for {area_code} ({entsoe_zone}) from {start_tz} to {end_tz}")
 
@@ -120,7 +150,7 @@ class PriceFetcher:
 
             # Make tz-naive for consistency
             if df.index.tzinfo is not None:
-                df.index = df.index.tz_convert('Europe/Stockholm').tz_localize(None)
+                df.index = df.index.tz_convert(self.TZ).tz_localize(None)
 
             logger.info(f"Fetched {len(df)} price points from ENTSO-E for {area_code}")
             return df
@@ -142,29 +172,60 @@ class PriceFetcher:
         zone = self.ZONE_MAP.get(str(area_code).upper(), area_code)
 
         # Fetch from start of year to now
-        start = pd.Timestamp(f'{start_year}-01-01', tz='Europe/Stockholm')
-        end = pd.Timestamp.now(tz='Europe/Stockholm') + pd.Timedelta(days=1)
+        start = pd.Timestamp(f'{start_year}-01-01').tz_localize(self.TZ)
+        end = pd.Timestamp.now(tz=self.TZ) + pd.Timedelta(days=1)
 
         logger.info(f"Populating historical data for {zone} from {start} to {end}")
 
-        # ENTSO-E has limits, so fetch in chunks of ~30 days
+        # ENTSO-E has limits, so fetch in chunks of ~30 days. Chunks are
+        # collected and written in one transaction every few chunks, so an
+        # interrupted backfill keeps what it fetched. A failed write keeps
+        # its chunks and is retried after the next chunk.
         chunk_days = 30
+        flush_every = 6
         current = start
+        frames = []
         total_records = 0
 
-        while current < end:
-            chunk_end = min(current + pd.Timedelta(days=chunk_days), end)
-
+        try:
+            while current < end:
+                chunk_end = min(current + pd.Timedelta(days=chunk_days), end)
+
+                try:
+                    df = self._fetch_from_entsoe(zone, current.tz_localize(None), chunk_end.tz_localize(None))
+                    if df is not None and not df.empty:
+                        frames.append(df)
+                        logger.info(f"Fetched {len(df)} records for {zone} ({current.date()} to {chunk_end.date()})")
+                except Exception as e:
+                    logger.error(f"Error fetching chunk for {zone}: {e}")
+
+                current = chunk_end
+                if len(frames) >= flush_every:
+                    try:
+                        total_records += self._store_frames(frames, zone)
+                    except Exception as e:
+                        logger.error(f"Error storing chunks for {zone}, will retry after the next chunk: {e}")
+        except KeyboardInterrupt:
             try:
-                df = self._fetch_from_entsoe(zone, current.tz_localize(None), chunk_end.tz_localize(None))
-                if df is not None and not df.empty:
-                    self.db_manager.store_price_data(df, zone)
-                    total_records += len(df)
-                    logger.info(f"Stored {len(df)} records for {zone} ({current.date()} to {chunk_end.date()})")
+                saved = self._store_frames(frames, zone)
+                logger.warning(f"Populating {zone} interrupted; saved {total_records + saved} records")
             except Exception as e:
-                logger.error(f"Error fetching chunk for {zone}: {e}")
+                logger.error(f"Populating {zone} interrupted; could not save the last chunks: {e}")
+            raise
 
-            current = chunk_end
+        total_records += self._store_frames(frames, zone)
 
         logger.info(f"Finished populating {zone}: {total_records} total records")
         return total_records
+
+    def _store_frames(self, frames: list, zone: str) -> int:
+        """Write collected chunks in one transaction; the list is emptied only once stored.
+
+        Returns the row count written.
+        """
+        if not frames:
+            return 0
+        batch = pd.concat(frames)
+        self.db_manager.store_price_data(batch, zone)
+        frames.clear()
+        return len(batch)
@@ -1,4 +1,5 @@
 import logging
+import re
 from typing import Optional, Tuple
 
 import numpy as np
@@ -9,6 +10,36 @@ from utils.ai_table_reader import AITableReader
 
 logger = logging.getLogger(__name__)
 
+# Drop NBSP/thin/regular spaces and map European decimal comma to a dot
+_NUMERIC_TRANS = str.maketrans({"\u00A0": "", "\u202F": "", " ": "", ",": "."})
+# Anything left that cannot be part of a number
+_NUMERIC_CLEAN_RE = re.compile(r"[^0-9+\-.]")
+
+# Column name fragments that identify a date/time column
+_DATE_NAME_HINTS = ("date", "datum", "time", "tid")
+# Exact (case-insensitive) column names of our own export schema
+_STANDARD_DATE_COLUMNS = ("timestamp", "datetime", "date")
+_STANDARD_VALUE_COLUMNS = ("production_kwh",)
+
+# Explicit formats tried on a sample before falling back to the generic parser
+_DATETIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d")
+
+# Stream sheets without evaluating formulas or resolving external links
+_XLSX_ENGINE_KWARGS = {"read_only": True, "data_only": True, "keep_links": False}
+
+# Excel's day zero (serial 1 = 1900-01-01, including the 1900 leap-year bug)
+_EXCEL_EPOCH = np.datetime64("1899-12-30", "ns")
+_NS_PER_HOUR = 3_600_000_000_000
+_NS_PER_DAY = 24 * _NS_PER_HOUR
+# NaT as seen through an int64 view
+_NAT_I8 = np.iinfo(np.int64).min
+
+try:
+    import python_calamine  # noqa: F401
+    HAS_CALAMINE = True
+except ImportError:
+    HAS_CALAMINE = False
+
 
 class ProductionLoader:
     """Load and standardize solar production data.
@@ -69,7 +100,7 @@ class ProductionLoader:
 
         try:
             if is_excel:
-                df = pd.read_excel(file_path, engine="openpyxl")
+                df = self._read_excel(file_path)
             else:
                 df = self.fallback_reader.read(file_path)
 
@@ -82,6 +113,16 @@ class ProductionLoader:
                 f"Could not parse file. Set OPENAI_API_KEY to enable AI-assisted parsing. Error: {e}"
             )
 
+    def _read_excel(self, file_path: str) -> pd.DataFrame:
+        """Read an Excel sheet, preferring the streaming calamine engine when installed."""
+        if HAS_CALAMINE:
+            try:
+                return pd.read_excel(file_path, engine="calamine")
+            except Exception as e:
+                logger.debug(f"Calamine read failed, retrying with openpyxl: {e}")
+
+        return pd.read_excel(file_path, engine="openpyxl", engine_kwargs=_XLSX_ENGINE_KWARGS)
+
     def _process_with_columns(
         self, df: pd.DataFrame, datetime_col: str, value_col: str
     ) -> Tuple[pd.DataFrame, str]:
@@ -116,9 +157,7 @@ class ProductionLoader:
         prod = pd.to_numeric(prod_series, errors="coerce")
 
         # Build output
-        data = pd.DataFrame({"ts": ts, "production_kwh": prod}).dropna(subset=["ts"]).copy()
-        data = data[~data["production_kwh"].isna()]
-        data = data[data["production_kwh"] >= 0]
+        data = self._build_production_frame(ts, prod)
 
         return self._determine_granularity_and_aggregate(data)
 
@@ -126,8 +165,17 @@ class ProductionLoader:
         """Process DataFrame with auto-detected columns (fallback path)."""
         df = df.rename(columns={c: str(c).strip() for c in df.columns})
 
-        date_col = self._infer_date_col(df)
-        prod_col = self._infer_prod_col(df)
+        # Fast path: files already in our own schema need no inference
+        standard = self._standard_schema_columns(df)
+        if standard:
+            logger.info(f"Standard columns found: datetime={standard[0]}, value={standard[1]}")
+            return self._process_with_columns(df, *standard)
+
+        # Score each column's date coverage once; both inference steps reuse it
+        date_scores = {c: self._date_ratio(df[c].dropna().head(100)) for c in df.columns}
+
+        date_col = self._infer_date_col(df, date_scores)
+        prod_col = self._infer_prod_col(df, date_scores)
 
         if not date_col or not prod_col:
             raise ValueError(f"Could not detect date/production columns. Columns: {list(df.columns)}")
@@ -144,57 +192,98 @@ class ProductionLoader:
             prod_series = self._normalize_numeric_string(prod_series)
         prod = pd.to_numeric(prod_series, errors="coerce")
 
-        data = pd.DataFrame({"ts": ts, "production_kwh": prod}).dropna(subset=["ts"]).copy()
-        data = data[~data["production_kwh"].isna()]
-        data = data[data["production_kwh"] >= 0]
+        data = self._build_production_frame(ts, prod)
 
         return self._determine_granularity_and_aggregate(data)
 
+    def _build_production_frame(self, ts: pd.Series, prod: pd.Series) -> pd.DataFrame:
+        """Keep rows with a timestamp and a non-negative production value."""
+        values = prod.to_numpy(dtype="float64", na_value=np.nan)
+        # NaN compares False, so this also drops missing production values
+        mask = ts.notna().to_numpy() & (values >= 0)
+        return pd.DataFrame({"ts": ts.to_numpy()[mask], "production_kwh": values[mask]})
+
+    def _standard_schema_columns(self, df: pd.DataFrame) -> Optional[Tuple[str, str]]:
+        """Return (datetime_col, value_col) if the frame uses standard column names."""
+        by_name = {str(c).lower(): c for c in df.columns}
+        value_col = next((by_name[n] for n in _STANDARD_VALUE_COLUMNS if n in by_name), None)
+        if value_col is None:
+            return None
+        date_col = next((by_name[n] for n in _STANDARD_DATE_COLUMNS if n in by_name), None)
+        if date_col is None:
+            return None
+        return date_col, value_col
+
     def _determine_granularity_and_aggregate(self, data: pd.DataFrame) -> Tuple[pd.DataFrame, str]:
         """Determine data granularity and aggregate to hourly or daily."""
         if data.empty:
             return pd.DataFrame(columns=["production_kwh"]), "unknown"
 
-        norm_days = data["ts"].dt.normalize()
-        rows_per_day = data.groupby(norm_days).size()
-        median_rows_per_day = rows_per_day.median() if not rows_per_day.empty else 0
+        median_rows_per_day = self._median_rows_per_day(data["ts"])
 
         # Detect granularity: >1 row per day = sub-daily data
         is_sub_daily = median_rows_per_day >= 2
 
         if is_sub_daily:
             # Aggregate to hourly
-            idx = data["ts"].dt.floor('h')
-            out = (
-                pd.DataFrame({"dt": idx, "production_kwh": data["production_kwh"].values})
-                .groupby("dt")
-                .agg({"production_kwh": "sum"})
-                .sort_index()
-            )
+            idx = self._truncate_ts(data["ts"], _NS_PER_HOUR, "dt")
+            out = data["production_kwh"].groupby(idx).sum().to_frame()
             gran = "hourly"
             logger.info(f"Loaded {len(out)} production hours from {out.index.min()} to {out.index.max()}")
         else:
             # Daily data
-            idx = data["ts"].dt.normalize()
-            out = (
-                pd.DataFrame({"date": idx, "production_kwh": data["production_kwh"].values})
-                .groupby("date")
-                .agg({"production_kwh": "sum"})
-                .sort_index()
-            )
+            norm_days = self._truncate_ts(data["ts"], _NS_PER_DAY, "date")
+            out = data["production_kwh"].groupby(norm_days).sum().to_frame()
             gran = "daily"
             logger.info(f"Loaded {len(out)} production days from {out.index.min().date()} to {out.index.max().date()}")
 
         return out, gran
 
-    def _infer_date_col(self, df: pd.DataFrame) -> Optional[str]:
+    def _truncate_ts(self, ts: pd.Series, unit_ns: int, name: str) -> pd.Series:
+        """Floor naive timestamps to a whole unit using int64 division."""
+        i8 = ts.to_numpy(dtype="datetime64[ns]").view("i8")
+        floored = i8 // unit_ns * unit_ns
+        # NaT would floor (and wrap) to a real timestamp; keep it NaT
+        floored[i8 == _NAT_I8] = _NAT_I8
+        return pd.Series(floored.view("datetime64[ns]"), index=ts.index, name=name)
+
+    def _median_rows_per_day(self, ts: pd.Series) -> float:
+        """Median number of rows per calendar day, from one sweep over day numbers."""
+        i8 = ts.to_numpy(dtype="datetime64[ns]").view("i8")
+        # NaT rows belong to no day
+        days = i8[i8 != _NAT_I8] // _NS_PER_DAY
+        if days.size == 0:
+            return 0
+
+        # Exports are normally chronological; only sort when they are not
+        if (days[1:] < days[:-1]).any():
+            days = np.sort(days)
+
+        # Lengths of runs of equal day numbers are the per-day row counts
+        starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+        counts = np.diff(np.r_[starts, days.size])
+        return float(np.median(counts))
+
+    def _infer_date_col(self, df: pd.DataFrame, date_scores: Optional[dict] = None) -> Optional[str]:
         """Infer which column contains date/time data."""
         # First: check for datetime dtype
         for c in df.columns:
             if pd.api.types.is_datetime64_any_dtype(df[c]):
                 return c
 
-        # Second: try parsing each column and find best match
+        # Second: trust an obviously named column if its values parse as dates
+        for c in df.columns:
+            name = str(c).lower()
+            if not any(hint in name for hint in _DATE_NAME_HINTS):
+                continue
+            if date_scores is not None and c in date_scores:
+                ratio = date_scores[c]
+            else:
+                ratio = self._date_ratio(df[c].dropna().head(100))
+            if ratio >= 0.5:
+                return c
+
+        # Third: try parsing each column and find best match
         best_col = None
         best_ratio = 0.0
 
@@ -204,12 +293,14 @@ class ProductionLoader:
                 continue
 
             # Try parsing as datetime
-            parsed = pd.to_datetime(s, errors="coerce", dayfirst=True)
-            ratio = parsed.notna().mean()
+            if date_scores is not None and c in date_scores:
+                ratio = date_scores[c]
+            else:
+                ratio = self._date_ratio(s)
 
             # Also try Excel serial dates
             if ratio < 0.5 and np.issubdtype(s.dtype, np.number):
-                parsed2 = pd.to_datetime(s, unit='D', origin='1899-12-30', errors='coerce')
+                parsed2 = self._excel_serial_to_datetime(s)
                 ratio = max(ratio, parsed2.notna().mean())
 
             if ratio > best_ratio:
@@ -220,7 +311,7 @@ class ProductionLoader:
             return best_col
         return None
 
-    def _infer_prod_col(self, df: pd.DataFrame) -> Optional[str]:
+    def _infer_prod_col(self, df: pd.DataFrame, date_scores: Optional[dict] = None) -> Optional[str]:
         """Infer which column contains production values."""
         # Find numeric column with best coverage (excluding date-like columns)
         best_col = None
@@ -229,12 +320,11 @@ class ProductionLoader:
         for c in df.columns:
             col = df[c]
 
-            # Normalize strings if needed
+            # Only look at a sample of non-null values; normalize strings if needed
+            sample = col.dropna().head(200)
             if col.dtype == object:
-                norm = self._normalize_numeric_string(col)
-                s = pd.to_numeric(norm, errors="coerce").dropna().head(100)
-            else:
-                s = pd.to_numeric(col, errors="coerce").dropna().head(100)
+                sample = self._normalize_numeric_string(sample)
+            s = pd.to_numeric(sample, errors="coerce").dropna().head(100)
 
             if len(s) == 0:
                 continue
@@ -242,7 +332,10 @@ class ProductionLoader:
             ratio = len(s) / max(1, min(100, len(df[c])))
 
             # Skip columns that look like dates
-            if self._column_looks_like_date(df[c]):
+            if date_scores is not None and c in date_scores:
+                if date_scores[c] > 0.5:
+                    continue
+            elif self._column_looks_like_date(df[c]):
                 continue
 
             if ratio > best_ratio:
@@ -260,21 +353,20 @@ class ProductionLoader:
 
     def _column_looks_like_date(self, col: pd.Series) -> bool:
         """Check if column values look like dates."""
-        sample = col.dropna().head(20)
+        return self._date_ratio(col.dropna().head(20)) > 0.5
+
+    def _date_ratio(self, sample: pd.Series) -> float:
+        """Return the share of sample values that parse as datetimes."""
         if sample.empty:
-            return False
+            return 0.0
 
         parsed = pd.to_datetime(sample, errors="coerce", dayfirst=True)
-        return parsed.notna().mean() > 0.5
+        return float(parsed.notna().mean())
 
     def _normalize_numeric_string(self, s: pd.Series) -> pd.Series:
         """Normalize numeric text to parseable form."""
-        ss = s.astype(str)
-        ss = ss.str.replace("\u00A0", "", regex=False)  # NBSP
-        ss = ss.str.replace("\u202F", "", regex=False)  # Thin space
-        ss = ss.str.replace(" ", "", regex=False)
-        ss = ss.str.replace(",", ".", regex=False)  # European decimal
-        ss = ss.str.replace(r"[^0-9+\-\.]", "", regex=True)
+        ss = s.astype(str).str.translate(_NUMERIC_TRANS)
+        ss = ss.str.replace(_NUMERIC_CLEAN_RE, "", regex=True)
         return ss
 
     def _parse_datetime_series(self, date_series: pd.Series) -> pd.Series:
@@ -282,42 +374,59 @@ class ProductionLoader:
         s = date_series
 
         if pd.api.types.is_datetime64_any_dtype(s):
-            ts = pd.to_datetime(s, errors='coerce')
+            # Already parsed (e.g. by the Excel reader); nothing to convert
+            ts = s
         elif np.issubdtype(getattr(s, 'dtype', object), np.number):
             # Excel serial dates
-            ts = pd.to_datetime(s, unit='D', origin='1899-12-30', errors='coerce')
+            ts = self._excel_serial_to_datetime(s)
             self.last_parse_format = 'excel_serial'
         else:
             s_str = s.astype(str).str.strip()
 
-            # Try ISO format first
-            ts = pd.to_datetime(s_str, format='%Y-%m-%d %H:%M:%S', errors='coerce')
-
-            if ts.notna().mean() < 0.5:
-                # Try without seconds
-                ts2 = pd.to_datetime(s_str, format='%Y-%m-%d %H:%M', errors='coerce')
-                if ts2.notna().mean() > ts.notna().mean():
-                    ts = ts2
-
-            if ts.notna().mean() < 0.5:
-                # Try date only
-                ts2 = pd.to_datetime(s_str, format='%Y-%m-%d', errors='coerce')
-                if ts2.notna().mean() > ts.notna().mean():
-                    ts = ts2
-
-            if ts.notna().mean() < 0.5:
+            # Detect the format on a small sample, then parse the full column once
+            fmt = self._detect_datetime_format(s)
+            if fmt:
+                ts = pd.to_datetime(s_str, format=fmt, errors='coerce')
+            else:
                 # Generic fallback
                 ts = pd.to_datetime(s_str, errors='coerce', dayfirst=False)
 
         # Remove timezone if present
-        try:
-            if isinstance(ts.dtype, pd.DatetimeTZDtype):
-                ts = ts.dt.tz_convert(None)
-        except Exception:
-            pass
+        if isinstance(ts.dtype, pd.DatetimeTZDtype):
+            ts = ts.dt.tz_convert(None)
 
         return ts
 
+    def _excel_serial_to_datetime(self, s: pd.Series) -> pd.Series:
+        """Convert Excel serial day numbers to datetimes with NumPy arithmetic."""
+        days = pd.to_numeric(s, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        # Stay inside the datetime64[ns] range; anything else becomes NaT
+        valid = np.isfinite(days) & (days > -80_000) & (days < 130_000)
+        offsets = np.zeros(len(days), dtype="int64")
+        offsets[valid] = np.round(days[valid] * _NS_PER_DAY).astype("int64")
+        ts = _EXCEL_EPOCH + offsets.astype("timedelta64[ns]")
+        ts[~valid] = np.datetime64("NaT")
+        return pd.Series(ts, index=s.index)
+
+    def _detect_datetime_format(self, s: pd.Series) -> Optional[str]:
+        """Pick the explicit datetime format that best fits a sample of the column."""
+        # Drop missing values before astype(str) turns them into 'nan'/'None', and
+        # convert only a bounded slice; blank strings must not decide the format
+        head = s.dropna().head(128).astype(str).str.strip()
+        head = head[head != ''].head(32)
+        if head.empty:
+            return None
+
+        best_fmt = None
+        best_ratio = 0.0
+        for fmt in _DATETIME_FORMATS:
+            ratio = pd.to_datetime(head, format=fmt, errors='coerce').notna().mean()
+            if ratio > best_ratio:
+                best_ratio = ratio
+                best_fmt = fmt
+
+        return best_fmt if best_ratio >= 0.5 else None
+
     def get_last_ai_spec(self) -> Optional[dict]:
         """Return the AI analysis spec from the last parsing, if available."""
         return self.last_ai_spec
@@ -6,20 +6,40 @@ Command-line interface for the core functionality.
 """
 
 import argparse
+import json
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from datetime import datetime, timedelta
-import pandas as pd
-from dotenv import load_dotenv
 
-from core.price_fetcher import PriceFetcher
-from core.production_loader import ProductionLoader
-from core.price_analyzer import PriceAnalyzer
-from utils.ai_explainer import AIExplainer
+# EUR conversion rates per output currency (simplified, fixed)
+_CCY_RATES: dict[str, float] = {'SEK': 11.5, 'EUR': 1.0, 'USD': 1.1, 'NOK': 12.0}
+
+
+def _write_results(path, analysis, metadata):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'analysis': analysis,
+            'metadata': metadata
+        }, f, indent=2, default=str)
+
+
+def _storytelling_payload(analysis):
+    """Map the analysis summary onto the 'hero' payload AIExplainer expects."""
+    return {
+        'hero': {
+            'production_kwh': analysis['production_total'],
+            'revenue_sek': analysis['total_export_value_sek'],
+            'export_förluster': {
+                'timmar_som_kostat_dig': analysis['negative_price_hours'],
+                'kwh_exporterat_med_förlust': analysis['production_during_negative_prices'],
+                'andel_olönsam_export_pct': analysis['production_percentage_negative_prices'],
+                'kostnad_negativ_export_sek': analysis['negative_export_cost_abs_sek'],
+            },
+        }
+    }
+
 
 def main():
-    load_dotenv()
-    
     parser = argparse.ArgumentParser(description='Sourceful Energy Analysis Tool')
     parser.add_argument('--production-file', required=True, help='CSV file with production data')
     parser.add_argument('--area', required=True, help='Electricity area code (e.g., SE_4)')
@@ -30,6 +50,16 @@ def main():
     parser.add_argument('--ai-explain', action='store_true', help='Generate AI explanation')
     
     args = parser.parse_args()
+
+    # Heavy imports are deferred until the arguments are valid so that
+    # --help and usage errors return without loading pandas.
+    import pandas as pd
+    from dotenv import load_dotenv
+    from core.price_fetcher import PriceFetcher
+    from core.production_loader import ProductionLoader
+    from core.price_analyzer import PriceAnalyzer
+
+    load_dotenv()
     
     try:
         # Initialize components
@@ -39,14 +69,15 @@ def main():
         
         # Load production data
         print(f"Loading production data from {args.production_file}...")
-        production_df = production_loader.load_production_data(args.production_file)
+        production_df, _ = production_loader.load_production(args.production_file)
         
         # Determine date range
-        production_start = pd.Timestamp(production_df.index.min(), tz='Europe/Stockholm')
-        production_end = pd.Timestamp(production_df.index.max(), tz='Europe/Stockholm')
+        tz = PriceFetcher.TZ
+        production_start = production_df.index.min().tz_localize(tz)
+        production_end = production_df.index.max().tz_localize(tz)
         
-        start_date = pd.Timestamp(args.start_date, tz='Europe/Stockholm') if args.start_date else production_start
-        end_date = pd.Timestamp(args.end_date, tz='Europe/Stockholm') if args.end_date else production_end
+        start_date = pd.Timestamp(args.start_date).tz_localize(tz) if args.start_date else production_start
+        end_date = pd.Timestamp(args.end_date).tz_localize(tz) if args.end_date else production_end
         
         # Get price data
         print(f"Fetching price data for {args.area} from {start_date.date()} to {end_date.date()}...")
@@ -56,9 +87,7 @@ def main():
             print("No price data available for the specified period.")
             sys.exit(1)
         
-        # Currency conversion rate (simplified)
-        currency_rates = {'SEK': 11.5, 'EUR': 1.0, 'USD': 1.1, 'NOK': 12.0}
-        currency_rate = currency_rates.get(args.currency.upper(), 11.5)
+        currency_rate = _CCY_RATES.get(args.currency.upper(), 11.5)
         
         # Merge and analyze
         print("Analyzing data...")
@@ -74,27 +103,27 @@ def main():
         print(f"Cost from negative prices: {analysis['negative_export_cost_abs_sek']:.2f} {args.currency}")
         print(f"Total export value: {analysis['total_export_value_sek']:.2f} {args.currency}")
         
-        # AI explanation
-        if args.ai_explain:
-            print("\n=== AI EXPLANATION ===")
-            explainer = AIExplainer()
-            metadata = {
-                'area_code': args.area,
-                'currency': args.currency,
-                'file_name': Path(args.production_file).name
-            }
-            explanation = explainer.explain_analysis(analysis, metadata)
-            print(explanation)
-        
-        # Save results
-        if args.output:
-            import json
-            with open(args.output, 'w', encoding='utf-8') as f:
-                json.dump({
-                    'analysis': analysis,
-                    'metadata': metadata
-                }, f, indent=2, default=str)
-            print(f"\nResults saved to {args.output}")
+        metadata = {
+            'area_code': args.area,
+            'currency': args.currency,
+            'file_name': Path(args.production_file).name
+        }
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            # Write the results file while the (slow) AI explanation streams
+            save = pool.submit(_write_results, args.output, analysis, metadata) if args.output else None
+
+            if args.ai_explain:
+                print("\n=== AI EXPLANATION ===")
+                from utils.ai_explainer import get_explainer
+                explainer = get_explainer()
+                for chunk in explainer.explain_storytelling_stream(_storytelling_payload(analysis)):
+                    print(chunk, end='', flush=True)
+                print()
+
+            if save is not None:
+                save.result()
+                print(f"\nResults saved to {args.output}")
         
     except Exception as e:
         print(f"Error: {e}")
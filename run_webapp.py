@@ -5,6 +5,43 @@ Simple script to run the web application
 from app import app
 import os
 
+
+def serve_production(port):
+    """Serve with gunicorn (threaded workers) instead of the Werkzeug dev server.
+
+    Mirrors the Dockerfile command; WEB_CONCURRENCY and WEB_THREADS tune the
+    worker and thread counts. Falls back to app.run where gunicorn is not
+    available (e.g. Windows).
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        app.run(debug=False, host='0.0.0.0', port=port)
+        return
+
+    class _GunicornApp(BaseApplication):
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    options = {
+        'bind': f'0.0.0.0:{port}',
+        'workers': int(os.environ.get('WEB_CONCURRENCY', 2)),
+        'worker_class': 'gthread',
+        'threads': int(os.environ.get('WEB_THREADS', 4)),
+        'timeout': 300,
+    }
+    _GunicornApp(app, options).run()
+
+
 if __name__ == '__main__':
     # Get port from environment (Railway sets PORT)
     port = int(os.environ.get('PORT', 8080))
@@ -15,5 +52,6 @@ if __name__ == '__main__':
         print(f"📊 Access at: http://localhost:{port}")
         print("⚠️  Make sure your .env file has ENTSOE_API_KEY configured")
         print("🔧 Press Ctrl+C to stop the server\n")
-
-    app.run(debug=debug, host='0.0.0.0', port=port)
\ No newline at end of file
+        app.run(debug=True, host='0.0.0.0', port=port)
+    else:
+        serve_production(port)
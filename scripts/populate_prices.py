@@ -4,6 +4,7 @@
 import sys
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -31,15 +32,23 @@ def main():
 
     logger.info(f"Populating price data from {start_year} to today for zones: {zones}")
 
+    # Fetching is dominated by ENTSO-E latency, so overlap the zones
     total = 0
-    for zone in zones:
-        logger.info(f"\n{'='*50}")
-        logger.info(f"Processing {zone}")
-        logger.info(f"{'='*50}")
-
-        records = fetcher.populate_historical_data(zone, start_year=start_year)
-        total += records
-        logger.info(f"Added {records} records for {zone}")
+    with ThreadPoolExecutor(max_workers=len(zones)) as executor:
+        futures = {}
+        for zone in zones:
+            logger.info(f"Processing {zone}")
+            futures[executor.submit(fetcher.populate_historical_data, zone, start_year=start_year)] = zone
+
+        for future in as_completed(futures):
+            zone = futures[future]
+            try:
+                records = future.result()
+            except Exception as e:
+                logger.error(f"Failed to populate {zone}: {e}")
+                continue
+            total += records
+            logger.info(f"Added {records} records for {zone}")
 
     logger.info(f"\n{'='*50}")
     logger.info(f"COMPLETE: Added {total} total records")
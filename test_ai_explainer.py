@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Tests for the AI explainer's HTTP handling: circuit breaker, negative cache,
+retries, streaming and bulk explanations. No network access; the shared
+requests session is replaced by a scripted fake.
+"""
+
+import asyncio
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+import requests
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils import ai_explainer, llm_cache
+from utils.ai_explainer import AIExplainer, _CircuitBreaker, is_fallback_text
+
+
+PAYLOAD = {
+    'hero': {
+        'production_kwh': 5000,
+        'revenue_sek': 2500,
+        'export_förluster': {'timmar_som_kostat_dig': 42, 'kwh_exporterat_med_förlust': 120.5},
+    }
+}
+
+
+def payload(hours: int) -> dict:
+    """A non-trivial payload; different hours give different cache keys."""
+    return {'hero': {**PAYLOAD['hero'], 'export_förluster': {'timmar_som_kostat_dig': hours}}}
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=None, headers=None, lines=None, text=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._body = body if body is not None else {}
+        self._lines = lines or []
+        self.text = text if text is not None else json.dumps(self._body)
+        self.content = self.text.encode('utf-8')
+
+    def json(self):
+        return self._body
+
+    def iter_lines(self, decode_unicode=False):
+        yield from self._lines
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def chat(text: str) -> FakeResponse:
+    return FakeResponse(body={'choices': [{'message': {'content': text}}]})
+
+
+def sse(*deltas: str) -> FakeResponse:
+    lines = [f"data: {json.dumps({'choices': [{'delta': {'content': d}}]})}" for d in deltas]
+    return FakeResponse(lines=[': keep-alive', *lines, 'data: [DONE]'])
+
+
+class FakeSession:
+    """Replays scripted responses (or raises scripted exceptions) in order."""
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = []
+
+    def _next(self, method, url, kwargs):
+        self.calls.append((method, url, kwargs))
+        item = self.script.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def post(self, url, **kwargs):
+        return self._next('POST', url, kwargs)
+
+    def get(self, url, **kwargs):
+        return self._next('GET', url, kwargs)
+
+
+@pytest.fixture(autouse=True)
+def clean_state(monkeypatch):
+    for name in ('OPENAI_CACHE', 'OPENAI_SKIP_TRIVIAL', 'OPENAI_USE_BATCH', 'OPENAI_CB_THRESHOLD',
+                 'OPENAI_CB_COOLDOWN', 'OPENAI_CONCURRENCY', 'OPENAI_RPM', 'OPENAI_TIMEOUT'):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-key')
+    monkeypatch.setenv('OPENAI_BASE_URL', 'http://llm.test/v1')
+    ai_explainer._neg_cache_clear()
+    ai_explainer._get_breaker.cache_clear()
+    llm_cache._memory.clear()
+    yield
+    ai_explainer._neg_cache_clear()
+    ai_explainer._get_breaker.cache_clear()
+    llm_cache._memory.clear()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record retry sleeps instead of waiting."""
+    recorded = []
+    monkeypatch.setattr(ai_explainer.time, 'sleep', recorded.append)
+    return recorded
+
+
+@pytest.fixture
+def response_cache(monkeypatch, tmp_path):
+    """Enable the (opt-in) response cache in a temporary file."""
+    monkeypatch.setenv('OPENAI_CACHE', '1')
+    monkeypatch.setenv('OPENAI_CACHE_PATH', str(tmp_path / 'ai.sqlite'))
+
+
+def use_session(monkeypatch, *script) -> FakeSession:
+    session = FakeSession(*script)
+    monkeypatch.setattr(ai_explainer, '_get_session', lambda: session)
+    return session
+
+
+# ---------------- Circuit breaker ----------------
+
+def test_breaker_opens_after_threshold_and_fails_fast():
+    breaker = _CircuitBreaker(threshold=2, cooldown=60)
+    breaker.before_call()
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    with pytest.raises(RuntimeError, match='circuit_open'):
+        breaker.before_call()
+
+
+def test_breaker_half_open_probe_success_closes():
+    breaker = _CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record_failure()
+    breaker.before_call()
+    assert breaker.state == 'half-open'
+    breaker.record_success()
+    assert breaker.state == 'closed'
+
+
+@pytest.mark.parametrize('error', [
+    requests.exceptions.ChunkedEncodingError('truncated'),
+    requests.exceptions.InvalidURL('bad url'),
+    requests.exceptions.TooManyRedirects('loop'),
+])
+def test_failed_half_open_probe_reopens(monkeypatch, error):
+    breaker = ai_explainer._get_breaker()
+    breaker.state, breaker.opened_at, breaker.cooldown = 'open', 0.0, 0.0
+    use_session(monkeypatch, error)
+    with pytest.raises(type(error)):
+        ai_explainer._guarded_post('http://llm.test/v1/chat/completions')
+    assert breaker.state == 'open'
+
+
+def test_server_errors_count_as_failures(monkeypatch):
+    monkeypatch.setenv('OPENAI_CB_THRESHOLD', '2')
+    use_session(monkeypatch, FakeResponse(502), FakeResponse(503))
+    for _ in range(2):
+        ai_explainer._guarded_post('http://llm.test/v1/chat/completions')
+    with pytest.raises(RuntimeError, match='circuit_open'):
+        ai_explainer._guarded_post('http://llm.test/v1/chat/completions')
+
+
+# ---------------- Retries and negative cache ----------------
+
+def test_retries_transient_error_then_caches(monkeypatch, sleeps, response_cache):
+    session = use_session(monkeypatch, FakeResponse(500), chat('  Svar.  '))
+    explainer = AIExplainer()
+    assert explainer.explain_storytelling(PAYLOAD) == 'Svar.'
+    assert len(session.calls) == 2 and len(sleeps) == 1
+    # Served from the response cache without another request
+    assert explainer.explain_storytelling(PAYLOAD) == 'Svar.'
+    assert len(session.calls) == 2
+
+
+def test_retry_after_is_a_lower_bound(monkeypatch, sleeps):
+    use_session(monkeypatch, FakeResponse(503, headers={'Retry-After': '7'}), chat('Svar.'))
+    assert AIExplainer().explain_storytelling(PAYLOAD) == 'Svar.'
+    assert sleeps and sleeps[0] >= 7
+
+
+def test_long_retry_after_gives_up(monkeypatch, sleeps):
+    session = use_session(monkeypatch, FakeResponse(503, headers={'Retry-After': '120'}))
+    text = AIExplainer().explain_storytelling(PAYLOAD)
+    assert is_fallback_text(text)
+    assert len(session.calls) == 1 and not sleeps
+
+
+def test_auth_error_is_negatively_cached(monkeypatch, sleeps):
+    session = use_session(monkeypatch, FakeResponse(401, text='{"error": "auth"}'))
+    explainer = AIExplainer()
+    text = explainer.explain_storytelling(payload(1))
+    assert is_fallback_text(text) and text.endswith('(Reservförklaring – auth)')
+    assert len(session.calls) == 1
+
+    expires = ai_explainer._NEG_CACHE['auth']
+    text = explainer.explain_storytelling(payload(2))
+    assert text.endswith('(Reservförklaring – auth)')
+    assert len(session.calls) == 1
+    # A cached hit must not push the expiry further out
+    assert ai_explainer._NEG_CACHE['auth'] == expires
+
+
+def test_fallback_output_and_detection():
+    explainer = AIExplainer()
+    facts = {'produktion_kwh': 10, 'intakter_sek': 2.5, 'timmar_som_kostat_dig': 3}
+    text = explainer._manual_fallback(facts, reason='timeout')
+    assert text == ("Anläggningen producerade 10 kWh med totala intäkter 2.5 SEK. "
+                    "Under 3 timmar kostade exporten pengar. "
+                    "Intelligent exportstyrning kan förbättra resultatet. (Reservförklaring – timeout)")
+    assert is_fallback_text(text)
+    assert not is_fallback_text('Svar.') and not is_fallback_text(None)
+
+
+def test_bullet_line_cache_distinguishes_int_and_float():
+    explainer = AIExplainer()
+    assert '1000 timmar' in explainer._facts_to_bullet_line({'timmar_som_kostat_dig': 1000.0})
+    assert '1 000 timmar' in explainer._facts_to_bullet_line({'timmar_som_kostat_dig': 1000})
+
+
+def test_malformed_env_settings_use_defaults(monkeypatch):
+    monkeypatch.setenv('OPENAI_CONCURRENCY', 'eight')
+    monkeypatch.setenv('OPENAI_RPM', '')
+    monkeypatch.setenv('OPENAI_TIMEOUT', '4O')
+    explainer = AIExplainer()
+    assert (explainer.concurrency, explainer.rpm, explainer.timeout_s) == (8, 500, 40.0)
+
+
+# ---------------- Streaming ----------------
+
+def test_stream_parses_server_sent_events(monkeypatch):
+    session = use_session(monkeypatch, sse('Negativa ', 'priser ', 'kostar.'))
+    chunks = list(AIExplainer().explain_storytelling_stream(PAYLOAD))
+    assert chunks == ['Negativa ', 'priser ', 'kostar.']
+    assert session.calls[0][2]['stream'] is True
+    assert json.loads(session.calls[0][2]['data'])['stream'] is True
+
+
+def test_stream_stops_at_max_words(monkeypatch):
+    # 'å ' continues the word 'två' split across chunks
+    use_session(monkeypatch, sse('ett tv', 'å ', 'tre ', 'fyra'))
+    chunks = list(AIExplainer().explain_storytelling_stream(PAYLOAD, max_words=3))
+    assert ''.join(chunks) == 'ett två tre '
+
+
+def test_stream_stops_at_first_paragraph(monkeypatch):
+    use_session(monkeypatch, sse('Första stycket.', '\n\nAndra ', 'stycket.'))
+    chunks = list(AIExplainer().explain_storytelling_stream(PAYLOAD, first_paragraph=True))
+    assert ''.join(chunks) == 'Första stycket.'
+
+
+def test_stream_quota_error_does_not_repost(monkeypatch, sleeps):
+    session = use_session(monkeypatch, FakeResponse(429, headers={'Retry-After': '5'}, text='rate limit'))
+    chunks = list(AIExplainer().explain_storytelling_stream(PAYLOAD))
+    assert len(chunks) == 1 and chunks[0].endswith('(Reservförklaring – kvot)')
+    assert len(session.calls) == 1
+    assert 'kvot' in ai_explainer._NEG_CACHE
+
+
+def test_stream_transient_error_falls_back_to_blocking_call(monkeypatch, sleeps):
+    session = use_session(monkeypatch, FakeResponse(500), chat('Svar.'))
+    assert list(AIExplainer().explain_storytelling_stream(PAYLOAD)) == ['Svar.']
+    assert len(session.calls) == 2
+
+
+# ---------------- Bulk explanations ----------------
+
+def test_explain_many_concurrent_keeps_order_and_bounds_concurrency(monkeypatch):
+    explainer = AIExplainer()
+    lock = threading.Lock()
+    in_flight = peak = 0
+
+    def fake_explain(p):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.02)
+        with lock:
+            in_flight -= 1
+        return f"svar {p['n']}"
+
+    monkeypatch.setattr(explainer, 'explain_storytelling', fake_explain)
+    payloads = [{'n': i} for i in range(8)]
+    texts = asyncio.run(explainer.explain_many_concurrent(payloads, max_concurrency=3, rpm=0))
+    assert texts == [f"svar {i}" for i in range(8)]
+    assert 1 < peak <= 3
+
+
+def test_explain_many_concurrent_paces_request_starts(monkeypatch):
+    explainer = AIExplainer()
+    starts = []
+
+    def fake_explain(p):
+        starts.append(time.monotonic())
+        return 'ok'
+
+    monkeypatch.setattr(explainer, 'explain_storytelling', fake_explain)
+    asyncio.run(explainer.explain_many_concurrent([{}] * 4, max_concurrency=4, rpm=1200))
+    # 1200 rpm -> starts at least 50 ms apart
+    assert starts[-1] - starts[0] >= 0.14
+
+
+def test_explain_many_uses_env_settings(monkeypatch):
+    monkeypatch.setenv('OPENAI_CONCURRENCY', '2')
+    monkeypatch.setenv('OPENAI_RPM', '0')
+    explainer = AIExplainer()
+    seen = {}
+
+    async def fake_many(payloads, max_concurrency, rpm):
+        seen.update(n=len(payloads), max_concurrency=max_concurrency, rpm=rpm)
+        return ['ok'] * len(payloads)
+
+    monkeypatch.setattr(explainer, 'explain_many_concurrent', fake_many)
+    assert explainer.explain_many([{}, {}]) == ['ok', 'ok']
+    assert seen == {'n': 2, 'max_concurrency': 2, 'rpm': 0}
+
+
+# ---------------- Batch API ----------------
+
+def batch_output(*records) -> FakeResponse:
+    lines = [json.dumps({'custom_id': cid, 'response': {'body': {'choices': [{'message': {'content': text}}]}}})
+             for cid, text in records]
+    return FakeResponse(text='\n'.join(lines) + '\n')
+
+
+def test_submit_batch_uploads_one_request_per_payload(monkeypatch):
+    session = use_session(monkeypatch, FakeResponse(body={'id': 'file-1'}), FakeResponse(body={'id': 'batch-1'}))
+    explainer = AIExplainer()
+    assert explainer.submit_batch([payload(1), payload(2)]) == 'batch-1'
+
+    upload, start = session.calls
+    assert upload[1] == 'http://llm.test/v1/files'
+    _, content, _ = upload[2]['files']['file']
+    requests_ = [json.loads(line) for line in content.decode('utf-8').splitlines()]
+    assert [r['custom_id'] for r in requests_] == ['0', '1']
+    assert all(r['url'] == '/v1/chat/completions' and r['body']['model'] == explainer.model for r in requests_)
+    assert '1 timmar' in requests_[0]['body']['messages'][0]['content']
+    assert start[1] == 'http://llm.test/v1/batches'
+    assert start[2]['json']['input_file_id'] == 'file-1'
+
+
+def test_poll_batch_states(monkeypatch):
+    use_session(
+        monkeypatch,
+        FakeResponse(body={'status': 'in_progress'}),
+        FakeResponse(body={'status': 'completed', 'output_file_id': 'out-1'}),
+        batch_output(('1', ' andra '), ('0', 'första')),
+        FakeResponse(body={'status': 'expired'}),
+    )
+    explainer = AIExplainer()
+    assert explainer.poll_batch('batch-1') is None
+    assert explainer.poll_batch('batch-1') == {'0': 'första', '1': 'andra'}
+    with pytest.raises(RuntimeError, match='batch expired'):
+        explainer.poll_batch('batch-1')
+
+
+def test_explain_batch_maps_results_and_skips_cached(monkeypatch, sleeps, response_cache):
+    explainer = AIExplainer()
+    llm_cache.set(explainer._cache_key(explainer._build_facts(payload(2))), 'cachad')
+    session = use_session(
+        monkeypatch,
+        FakeResponse(body={'id': 'file-1'}),
+        FakeResponse(body={'id': 'batch-1'}),
+        FakeResponse(body={'status': 'validating'}),
+        FakeResponse(body={'status': 'completed', 'output_file_id': 'out-1'}),
+        # custom_ids index the submitted (uncached) payloads: 1, 3
+        batch_output(('0', 'svar ett')),
+    )
+    texts = explainer.explain_batch([payload(1), payload(2), payload(3)], poll_interval=5)
+    assert texts[:2] == ['svar ett', 'cachad']
+    assert texts[2].endswith('(Reservförklaring – batch)')
+    assert sleeps == [5]
+    submitted = session.calls[0][2]['files']['file'][1].decode('utf-8').splitlines()
+    assert len(submitted) == 2
+    # Batch results are cached like live answers
+    assert llm_cache.get(explainer._cache_key(explainer._build_facts(payload(1)))) == 'svar ett'
+
+
+def test_explain_batch_failure_falls_back(monkeypatch):
+    use_session(monkeypatch, FakeResponse(401, text='auth'))
+    texts = AIExplainer().explain_batch([payload(1), payload(2)])
+    assert all(t.endswith('(Reservförklaring – auth)') for t in texts)
+
+
+def test_explain_many_routes_to_batch(monkeypatch):
+    monkeypatch.setenv('OPENAI_USE_BATCH', '1')
+    explainer = AIExplainer()
+    monkeypatch.setattr(explainer, 'explain_batch', lambda payloads: ['batch'] * len(payloads))
+    assert explainer.explain_many([{}, {}]) == ['batch', 'batch']
+
+
+def test_breaker_call_counts_any_client(monkeypatch):
+    def send():
+        raise ValueError('client error')
+
+    monkeypatch.setenv('OPENAI_CB_THRESHOLD', '1')
+    with pytest.raises(ValueError):
+        ai_explainer._breaker_call(send)
+    assert ai_explainer._get_breaker().state == 'open'
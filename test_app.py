@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests for the web app's se-cli analysis cache, through the Flask test client.
+se-cli itself is replaced by a fake subprocess run.
+"""
+
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import app as app_module
+
+CSV = b"timestamp,production_kwh\n2024-06-01 12:00,1.5\n2024-06-01 13:00,2.0\n"
+FALLBACK = "Anläggningen producerade 3.5 kWh. (Reservförklaring – timeout)"
+
+
+@pytest.fixture
+def cli(monkeypatch, tmp_path):
+    """Fake se-cli: records each run and prints the analysis in cli.output."""
+    for name in ('ANALYSIS_CACHE_DIR', 'RESULTS_DIR'):
+        path = tmp_path / name.lower()
+        path.mkdir()
+        monkeypatch.setattr(app_module, name, path)
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+
+    class FakeCli:
+        runs = []
+        output = {'hero': {'production_kwh': 3.5}, 'input': {'granularity': 'hourly'}}
+
+    def fake_run(cmd, **kwargs):
+        FakeCli.runs.append(cmd)
+        return subprocess.CompletedProcess(cmd, 0, stdout=json.dumps(FakeCli.output), stderr='')
+
+    monkeypatch.setattr(app_module.subprocess, 'run', fake_run)
+    return FakeCli
+
+
+def analyze(data: bytes = CSV, filename: str = 'production.csv', area: str = 'SE_4'):
+    client = app_module.app.test_client()
+    response = client.post('/analyze', data={'production_file': (io.BytesIO(data), filename), 'area': area},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_repeat_upload_is_served_from_cache(cli):
+    first = analyze()
+    second = analyze(filename='renamed.csv')
+    assert len(cli.runs) == 1
+    assert second['analysis'] == first['analysis']
+    assert len(list(app_module.ANALYSIS_CACHE_DIR.glob('*.json'))) == 1
+
+
+def test_cache_key_covers_content_and_parameters(cli):
+    analyze()
+    analyze(area='SE_3')
+    analyze(data=CSV + b"2024-06-01 14:00,0.5\n")
+    assert len(cli.runs) == 3
+
+
+@pytest.mark.parametrize('ai_fields', [
+    {'ai_explanation_sv': FALLBACK},
+    {'ai_explanation_sv_error': 'HTTP 429: rate limit'},
+])
+def test_failed_ai_explanations_are_not_cached(cli, ai_fields):
+    cli.output = {**cli.output, **ai_fields}
+    analyze()
+    analyze()
+    assert len(cli.runs) == 2
+    assert not list(app_module.ANALYSIS_CACHE_DIR.glob('*.json'))
+
+
+def test_expired_entries_are_rerun_and_removed(cli):
+    analyze()
+    (cached,) = app_module.ANALYSIS_CACHE_DIR.glob('*.json')
+    old = time.time() - app_module.ANALYSIS_CACHE_TTL - 60
+    os.utime(cached, (old, old))
+
+    assert app_module.load_cached_analysis(cached.stem) is None
+    assert not cached.exists()
+    analyze()
+    assert len(cli.runs) == 2
+
+
+def test_sweep_caps_the_cache_directory(monkeypatch, cli):
+    monkeypatch.setattr(app_module, 'ANALYSIS_CACHE_MAX_ENTRIES', 2)
+    now = time.time()
+    for i, key in enumerate(('a', 'b', 'c')):
+        app_module.store_cached_analysis(key, {'n': i})
+        os.utime(app_module.ANALYSIS_CACHE_DIR / f'{key}.json', (now - 30 + i, now - 30 + i))
+    app_module.sweep_analysis_cache()
+    assert sorted(p.stem for p in app_module.ANALYSIS_CACHE_DIR.glob('*.json')) == ['b', 'c']
@@ -63,9 +63,10 @@ def test_database():
         db_manager = PriceDatabaseManager(db_path)
         print("✓ Database created successfully")
         
-        # Clean up
-        if os.path.exists(db_path):
-            os.remove(db_path)
+        # Clean up (including WAL sidecar files)
+        for path in (db_path, f"{db_path}-wal", f"{db_path}-shm"):
+            if os.path.exists(path):
+                os.remove(path)
         
         return True
     except Exception as e:
@@ -77,20 +78,18 @@ def test_price_analyzer():
     print("\nTesting price analyzer...")
     
     try:
+        import numpy as np
         import pandas as pd
         from core.price_analyzer import PriceAnalyzer
         
         # Create sample data
-        dates = pd.date_range('2024-01-01', periods=24, freq='H')
-        prices_df = pd.DataFrame({
-            'price_eur_per_mwh': [50, -10, 30, 40, 50, 60, 70, 80, 90, 100, 110, 120,
-                                  130, 120, 110, 100, 90, 80, 70, 60, 50, 40, 30, 20]
-        }, index=dates)
-        
-        production_df = pd.DataFrame({
-            'production_kwh': [0, 0, 0, 0, 0, 0.5, 1, 2, 3, 4, 5, 6,
-                               7, 6, 5, 4, 3, 2, 1, 0.5, 0, 0, 0, 0]
-        }, index=dates)
+        dates = pd.date_range('2024-01-01', periods=24, freq='h')
+        prices = np.asarray([50, -10, 30, 40, 50, 60, 70, 80, 90, 100, 110, 120,
+                             130, 120, 110, 100, 90, 80, 70, 60, 50, 40, 30, 20], dtype=np.float64)
+        production = np.asarray([0, 0, 0, 0, 0, 0.5, 1, 2, 3, 4, 5, 6,
+                                 7, 6, 5, 4, 3, 2, 1, 0.5, 0, 0, 0, 0], dtype=np.float64)
+        prices_df = pd.DataFrame({'price_eur_per_mwh': prices}, index=dates, copy=False)
+        production_df = pd.DataFrame({'production_kwh': production}, index=dates, copy=False)
         
         analyzer = PriceAnalyzer()
         merged_df = analyzer.merge_data(prices_df, production_df)
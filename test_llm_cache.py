@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for the AI explanation cache (in-memory LRU and optional sqlite file).
+"""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils import llm_cache
+
+
+@pytest.fixture(autouse=True)
+def clean_cache(monkeypatch):
+    for name in ('OPENAI_CACHE', 'OPENAI_CACHE_PATH', 'OPENAI_CACHE_TTL'):
+        monkeypatch.delenv(name, raising=False)
+    llm_cache._memory.clear()
+    yield
+    llm_cache._memory.clear()
+
+
+@pytest.fixture
+def disk_cache(monkeypatch, tmp_path):
+    path = tmp_path / 'cache' / 'ai.sqlite'
+    monkeypatch.setenv('OPENAI_CACHE', '1')
+    monkeypatch.setenv('OPENAI_CACHE_PATH', str(path))
+    return path
+
+
+def test_disabled_without_opt_in():
+    llm_cache.set('k', 'text')
+    assert llm_cache.get('k') is None
+    assert not llm_cache._memory
+    assert llm_cache._disk_path() is None
+
+
+def test_lru_evicts_least_recently_used(disk_cache, monkeypatch):
+    monkeypatch.setattr(llm_cache, 'MAX_ENTRIES', 2)
+    llm_cache.set('a', '1')
+    llm_cache.set('b', '2')
+    llm_cache.get('a')
+    llm_cache.set('c', '3')
+    assert list(llm_cache._memory) == ['a', 'c']
+
+
+def test_disk_entries_survive_a_new_process(disk_cache):
+    llm_cache.set('k', 'sparad text')
+    assert disk_cache.exists()
+    llm_cache._memory.clear()
+    assert llm_cache.get('k') == 'sparad text'
+    # Read-through also fills the in-memory LRU
+    assert llm_cache._memory['k'][0] == 'sparad text'
+
+
+def test_disk_entries_expire(disk_cache, monkeypatch):
+    llm_cache.set('k', 'gammal')
+    with sqlite3.connect(disk_cache) as conn:
+        conn.execute('UPDATE responses SET ts = ts - 100')
+    llm_cache._memory.clear()
+    monkeypatch.setenv('OPENAI_CACHE_TTL', '50')
+    assert llm_cache.get('k') is None
+    monkeypatch.setenv('OPENAI_CACHE_TTL', 'not-a-number')
+    assert llm_cache.get('k') == 'gammal'
+
+
+def test_memory_entries_expire(disk_cache, monkeypatch):
+    llm_cache.set('k', 'text')
+    monkeypatch.setenv('OPENAI_CACHE_TTL', '-1')
+    assert llm_cache.get('k') is None
+    assert 'k' not in llm_cache._memory
+
+
+def test_expired_rows_are_deleted_on_write(disk_cache, monkeypatch):
+    llm_cache.set('old', 'gammal')
+    with sqlite3.connect(disk_cache) as conn:
+        conn.execute('UPDATE responses SET ts = ts - 100')
+    monkeypatch.setenv('OPENAI_CACHE_TTL', '50')
+    llm_cache.set('new', 'ny')
+    with sqlite3.connect(disk_cache) as conn:
+        keys = [row[0] for row in conn.execute('SELECT key FROM responses')]
+    assert keys == ['new']
+
+
+def test_unwritable_disk_cache_is_ignored(monkeypatch, tmp_path):
+    blocker = tmp_path / 'file'
+    blocker.write_text('')
+    monkeypatch.setenv('OPENAI_CACHE', '1')
+    monkeypatch.setenv('OPENAI_CACHE_PATH', str(blocker / 'ai.sqlite'))
+    llm_cache.set('k', 'text')
+    assert llm_cache.get('k') == 'text'
+    llm_cache._memory.clear()
+    assert llm_cache.get('k') is None
@@ -11,19 +11,20 @@ load_dotenv()
 def extract_text(resp):
     # Försök plocka ut text på ett robust men enkelt sätt
     try:
+        # SDK:ns färdiga sammanfogning räcker i det vanliga fallet
+        text = getattr(resp, 'output_text', None)
+        if text:
+            return text.strip()
         pieces = []
         for item in getattr(resp, 'output', []) or []:
-            t = getattr(item, 'type', None)
-            if t == 'message':
-                for block in getattr(item, 'content', []) or []:
-                    if getattr(block, 'type', None) in ('output_text', 'text') and hasattr(block, 'text'):
-                        pieces.append(block.text)
-            elif t in ('output_text', 'text') and hasattr(item, 'text'):
-                pieces.append(item.text)
-        if pieces:
-            return "\n".join(pieces).strip()
-        # En del SDK-versioner exponerar output_text direkt
-        return getattr(resp, 'output_text', None) or str(resp)
+            match getattr(item, 'type', None):
+                case 'message':
+                    for block in getattr(item, 'content', []) or []:
+                        if getattr(block, 'type', None) in ('output_text', 'text') and hasattr(block, 'text'):
+                            pieces.append(block.text)
+                case 'output_text' | 'text' if hasattr(item, 'text'):
+                    pieces.append(item.text)
+        return "\n".join(pieces).strip() if pieces else str(resp)
     except Exception:
         return str(resp)
 
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Tests for the historical price backfill's batched writes.
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.price_fetcher import PriceFetcher
+
+
+class FakeDB:
+    def __init__(self, fail_times: int = 0):
+        self.fail_times = fail_times
+        self.stored = []
+
+    def store_price_data(self, df, zone):
+        if self.fail_times:
+            self.fail_times -= 1
+            raise RuntimeError('database is locked')
+        self.stored.append(len(df))
+
+
+def fetcher(db, interrupt_at=None):
+    f = PriceFetcher.__new__(PriceFetcher)
+    f.db_manager = db
+    calls = []
+
+    def fetch(zone, start, end):
+        calls.append(start)
+        if len(calls) == interrupt_at:
+            raise KeyboardInterrupt
+        return pd.DataFrame({'price': [1.0, 2.0]})
+
+    f._fetch_from_entsoe = fetch
+    return f
+
+
+def test_backfill_writes_every_six_chunks():
+    db = FakeDB()
+    total = fetcher(db).populate_historical_data('SE4', start_year=pd.Timestamp.now().year - 1)
+    assert total == sum(db.stored)
+    assert db.stored[0] == 12 and len(db.stored) >= 2
+
+
+def test_interrupted_backfill_keeps_fetched_chunks():
+    db = FakeDB()
+    with pytest.raises(KeyboardInterrupt):
+        fetcher(db, interrupt_at=9).populate_historical_data('SE4', start_year=2024)
+    # Six chunks flushed on schedule, the next two on interrupt
+    assert db.stored == [12, 4]
+
+
+def test_failed_write_is_retried_after_the_next_chunk():
+    db = FakeDB(fail_times=1)
+    total = fetcher(db).populate_historical_data('SE4', start_year=pd.Timestamp.now().year - 1)
+    assert db.stored[0] == 14
+    assert total == sum(db.stored)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for production file parsing and aggregation.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.production_loader import ProductionLoader
+
+
+def load_csv(tmp_path, text: str):
+    path = tmp_path / 'production.csv'
+    path.write_text(text, encoding='utf-8')
+    return ProductionLoader().load_production(str(path), use_llm=False)
+
+
+def test_readings_keep_their_exact_values(tmp_path):
+    rows = ''.join(f"2024-06-01 {h // 2:02d}:{30 * (h % 2):02d},{'1.3' if h == 0 else '0.1'}\n" for h in range(48))
+    df, gran = load_csv(tmp_path, 'timestamp,production_kwh\n' + rows)
+
+    assert gran == 'hourly'
+    assert df['production_kwh'].dtype == 'float64'
+    assert df['production_kwh'].iloc[0] == 1.3 + 0.1
+    assert df['production_kwh'].iloc[1] == 0.1 + 0.1
+    # float32 round-tripping would be off by ~1e-8 here
+    assert df['production_kwh'].sum() == pytest.approx(6.0, rel=1e-12, abs=0)
+
+
+def test_format_detection_skips_blank_leading_rows():
+    loader = ProductionLoader()
+    s = pd.Series([None] * 40 + [''] * 5 + ['2024-01-01 00:00', '2024-01-01 01:00'] * 20)
+    assert loader._detect_datetime_format(s) == '%Y-%m-%d %H:%M'
+    assert loader._parse_datetime_series(s).notna().sum() == 40
+
+
+TIMESTAMPS = pd.Series([
+    pd.Timestamp('2024-01-01 10:35'), pd.NaT, pd.Timestamp('2024-01-01 10:59:59.999'),
+    pd.Timestamp('2024-01-01 11:00'), pd.Timestamp('1969-12-31 23:30'), pd.Timestamp('2024-03-31 02:15'),
+    pd.NaT, pd.Timestamp('2024-03-30 23:45'), pd.Timestamp('2024-01-02 00:00'),
+])
+
+
+@pytest.mark.parametrize('unit_ns, freq', [(3_600_000_000_000, 'h'), (86_400_000_000_000, 'D')])
+def test_truncate_ts_matches_pandas_floor(unit_ns, freq):
+    result = ProductionLoader()._truncate_ts(TIMESTAMPS, unit_ns, 'dt')
+    pd.testing.assert_series_equal(result, TIMESTAMPS.dt.floor(freq).rename('dt'))
+
+
+def test_excel_serial_matches_pandas():
+    serials = pd.Series([45000.5, np.nan, 1, 60.25, 61, -5.75, 45292.999988, 2958465.9, 45292])
+    result = ProductionLoader()._excel_serial_to_datetime(serials)
+    expected = pd.to_datetime(serials, unit='D', origin='1899-12-30', errors='coerce')
+    assert (result.isna() == expected.isna()).all()
+    # Float day fractions round differently at the nanosecond level; Excel itself
+    # stores times to the millisecond at best
+    assert ((result - expected).dropna().abs() < pd.Timedelta(microseconds=1)).all()
+
+
+@pytest.mark.parametrize('ts', [
+    TIMESTAMPS,
+    TIMESTAMPS.sample(frac=1, random_state=1),
+    pd.Series(pd.date_range('2024-01-01', periods=96, freq='15min')),
+    pd.Series(pd.date_range('2024-01-01', periods=10, freq='D').append(
+        pd.DatetimeIndex([pd.NaT] * 12 + [pd.Timestamp('2024-01-03 06:00')]))),
+])
+def test_median_rows_per_day_matches_groupby(ts):
+    expected = ts.groupby(ts.dt.date).size().median()
+    assert ProductionLoader()._median_rows_per_day(ts) == expected
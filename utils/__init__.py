@@ -4,21 +4,11 @@ Utility modules for CSV format detection and AI-powered analysis.
 
 from .csv_format_detector_fallback import CSVFormatDetectorFallback
 from .csv_format_module import CSVFormatDetector
+from .ai_explainer import AIExplainer, get_explainer
 
 __all__ = [
     "CSVFormatDetectorFallback",
     "CSVFormatDetector",
-]
-"""
-Utility modules for CSV format detection and AI-powered analysis.
-"""
-
-from .csv_format_detector_fallback import CSVFormatDetectorFallback
-from .csv_format_module import CSVFormatDetector
-from .ai_explainer import AIExplainer
-
-__all__ = [
-    "CSVFormatDetectorFallback",
-    "CSVFormatDetector",
-    "AIExplainer"
+    "AIExplainer",
+    "get_explainer"
 ]
@@ -1,13 +1,358 @@
+import asyncio
 import os
 import logging
 import json
+import hashlib
+import random
+import re
+import string
+import threading
 import time
-from typing import Any, Dict, Optional
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional
 from dotenv import load_dotenv
 import requests
+from requests.adapters import HTTPAdapter
+from . import llm_cache
 
 logger = logging.getLogger(__name__)
 
+# orjson is optional: it is several times faster at (de)serialising the
+# request and response bodies, the stdlib is used when it isn't installed
+try:
+    import orjson
+
+    def _json_dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+    _json_loads = json.loads
+
+# Prompt templates are parsed once at import; only the data line varies per call.
+# The data line comes last so the static instructions form a stable prefix
+# that providers with prompt caching can reuse between calls.
+_PROMPT_TMPL = string.Template(
+    "Skriv kortfattad svensk analys (max 120 ord) om export vid negativa spotpriser. "
+    "Viktigt: Detta baseras på spotpris exklusive moms och påslag - faktiskt resultat varierar med elbolag. "
+    "Fokusera på: Hur stor andel av exporten skedde vid negativa priser. "
+    "Förklara att negativa priser = systemöverskott av förnybar energi där export kostar pengar. "
+    "60-öringens bortfall 2025/2026 förvärrar detta. "
+    "Lösning: Exportstyrning när priserna är negativa. "
+    "Skriv som löpande text, inga listor eller bullets. "
+    "Data: $bullet_line."
+)
+_SHORT_PROMPT_TMPL = string.Template(
+    "Kort teknisk analys (1 stycke, max 120 ord) av solcellsanläggningen nedan. "
+    "Tolkning: 'produktion' och 'intäkter' = totala värden, 'timmar som kostade' = negativa exportperioder. "
+    "Fokus: marknadsvillkor, systemöverskott, exportkostnader. "
+    "Nämn 60-öringens bortfall 2025/2026. Endast faktiska siffror. "
+    "Data: $bullet_line."
+)
+# Routes requests sharing the prefix to the same cache on api.openai.com
+_PROMPT_CACHE_KEY = hashlib.sha256(_PROMPT_TMPL.template.encode('utf-8')).hexdigest()[:16]
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    # Only the delta-seconds form; OpenAI-compatible APIs don't send dates
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+# Error text -> short Swedish reason label, most specific label first
+_REASON_RE = re.compile(
+    r"(?P<circuit>circuit_open)|(?P<auth>auth|401)|(?P<kvot>429|quota)|(?P<modell>model)"
+    r"|(?P<timeout>(?i:timeout|timed out))"
+)
+_REASON_PRIORITY = ('circuit', 'auth', 'kvot', 'modell', 'timeout')
+
+
+def _reason_label(reason: str) -> str:
+    """Map an error message to the reason shown in the fallback text."""
+    if reason.startswith('cached:'):
+        return reason[7:]
+    found = {m.lastgroup for m in _REASON_RE.finditer(reason)}
+    return next((label for label in _REASON_PRIORITY if label in found), reason)
+
+
+class AIHTTPError(RuntimeError):
+    """Non-200 response from the AI endpoint, with the server's retry hint."""
+
+    def __init__(self, response: requests.Response):
+        super().__init__(f"HTTP {response.status_code}: {response.text[:180]}")
+        self.status = response.status_code
+        self.retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+
+
+def _env_number(name: str, default: float, cast=float):
+    """Numeric setting from the environment; a malformed value gives the default."""
+    raw = os.getenv(name)
+    if not raw:
+        return default
+    try:
+        return cast(raw)
+    except ValueError:
+        logger.warning(f"Ignoring invalid {name}={raw!r}, using {default}")
+        return default
+
+
+_DOTENV_LOADED = False
+
+
+def _ensure_dotenv() -> None:
+    """Read .env at most once per process."""
+    global _DOTENV_LOADED
+    if _DOTENV_LOADED:
+        return
+    try:
+        load_dotenv()
+    except Exception:
+        pass
+    _DOTENV_LOADED = True
+
+
+class _CircuitBreaker:
+    """Fail fast while the AI endpoint is down instead of waiting out timeouts.
+
+    After `threshold` consecutive failures (timeouts and other request errors,
+    HTTP 5xx) the circuit opens and calls raise immediately for `cooldown`
+    seconds. Then a single probe is let through (half-open): success closes
+    the circuit, failure re-opens it.
+    """
+
+    def __init__(self, threshold: int = 3, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.state = 'closed'
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == 'closed':
+                return
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = 'half-open'
+                return
+            raise RuntimeError('circuit_open')
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.state = 'closed'
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half-open' or self.failures >= self.threshold:
+                if self.state != 'open':
+                    logger.warning(f"AI circuit opened after {self.failures} failures")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+
+@lru_cache(maxsize=1)
+def _get_breaker() -> _CircuitBreaker:
+    """Process-wide breaker, configured from the environment on first use
+    (after .env has been loaded): OPENAI_CB_THRESHOLD failures open it for
+    OPENAI_CB_COOLDOWN seconds."""
+    return _CircuitBreaker(
+        threshold=_env_number('OPENAI_CB_THRESHOLD', 3, int),
+        cooldown=_env_number('OPENAI_CB_COOLDOWN', 30.0),
+    )
+
+# Errors that will not go away on retry short-circuit further calls for a
+# while (reason label -> seconds), so the fallback is returned immediately
+_NEG_CACHE_TTL = {'auth': 600.0, 'kvot': 60.0, 'modell': 600.0}
+_NEG_CACHE: Dict[str, float] = {}
+# Error text that means retrying (or re-posting) now would fail the same way
+_NO_RETRY_KEYS = ('401', 'auth', 'quota', 'model_not_found', '429', 'circuit_open')
+_NEG_CACHE_LOCK = threading.Lock()
+
+
+def _neg_cache_check() -> None:
+    now = time.monotonic()
+    with _NEG_CACHE_LOCK:
+        for reason, expires in _NEG_CACHE.items():
+            if expires > now:
+                raise RuntimeError(f"cached:{reason}")
+
+
+def _neg_cache_set(reason: str, retry_after: Optional[float] = None) -> None:
+    ttl = _NEG_CACHE_TTL.get(reason)
+    if ttl is not None:
+        if retry_after is not None:
+            ttl = retry_after
+        with _NEG_CACHE_LOCK:
+            _NEG_CACHE[reason] = time.monotonic() + ttl
+
+
+def _neg_cache_clear() -> None:
+    with _NEG_CACHE_LOCK:
+        _NEG_CACHE.clear()
+
+
+@lru_cache(maxsize=1)
+def _get_session() -> requests.Session:
+    """Shared HTTP session so repeated explanations reuse the TLS connection.
+
+    Retries are left to explain_storytelling, which knows which errors are
+    worth retrying; the pool is sized for the web app's worker threads.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _breaker_call(send: Callable[[], Any]) -> Any:
+    """Run one HTTP call (any client) under the circuit breaker.
+
+    Exceptions and 5xx responses count as failures, anything else as a
+    success; the response is returned unchanged.
+    """
+    breaker = _get_breaker()
+    breaker.before_call()
+    try:
+        r = send()
+    except Exception:
+        # Any failure counts, or a half-open probe would never resolve
+        breaker.record_failure()
+        raise
+    if r.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return r
+
+
+def _guarded_post(url: str, **kwargs) -> requests.Response:
+    """POST through the shared session, guarded by the circuit breaker."""
+    return _breaker_call(lambda: _get_session().post(url, **kwargs))
+
+
+def _walk(obj: Any, path: str) -> Any:
+    """Look up a dotted path in nested dicts; missing or None values give 0."""
+    for part in path.split('.'):
+        if not isinstance(obj, dict):
+            return 0
+        obj = obj.get(part)
+    return 0 if obj is None else obj
+
+
+def _always(v: Any) -> bool:
+    return True
+
+
+def _positive(v: Any) -> bool:
+    return v > 0
+
+
+# Facts sent to the model, in priority order: (fact key, path in the hero
+# payload, formatter, inclusion test). Only export-related metrics are used.
+_FACT_SPEC = (
+    ('produktion_kwh', 'production_kwh', lambda v: round(float(v), 1), _always),
+    ('intakter_sek', 'revenue_sek', lambda v: round(float(v), 0), _always),
+    # Pain points - export focus
+    ('timmar_som_kostat_dig', 'export_förluster.timmar_som_kostat_dig', int, _positive),
+    ('kwh_exporterat_med_förlust', 'export_förluster.kwh_exporterat_med_förlust', lambda v: round(v, 1), _positive),
+    ('andel_olönsam_export_pct', 'export_förluster.andel_olönsam_export_pct', lambda v: round(v, 1), _positive),
+    ('kostnad_negativ_export_sek', 'export_förluster.kostnad_negativ_export_sek', lambda v: round(v, 0), _positive),
+    # Export control potential
+    ('zap_negativa_timmar', 'zap_lösning.export_under_negativa_priser.timmar', lambda v: v, _positive),
+    ('zap_export_optimerad_kwh', 'zap_lösning.export_under_negativa_priser.kwh', lambda v: round(v, 1), _positive),
+    ('zap_dagar_drabbade', 'zap_lösning.export_under_negativa_priser.dagar_drabbade', lambda v: v, _positive),
+    # Traditional metrics (lower priority)
+    ('andel_neg_timmar_pct', 'share_non_positive_during_production_pct',
+     lambda v: round(float(v), 1), lambda v: float(v) > 0),
+    ('timing_rabatt_pct', 'timing_discount_pct', lambda v: round(float(v), 1), lambda v: float(v) != 0),
+    ('energi_vid_golv0_kwh', 'counterfactuals.lost_energy_kwh_at_floor_0', lambda v: round(float(v), 1), bool),
+)
+
+
+# Facts that are always present; a payload with nothing else is trivial
+_TRIVIAL_FACTS = frozenset({'produktion_kwh', 'intakter_sek'})
+
+# Manual fallback sentences, in order: (fact key, template), each used when
+# the fact is set. Without any export control facts the generic line is used.
+_FALLBACK_SENTENCES = (
+    ('timmar_som_kostat_dig', "Under {} timmar kostade exporten pengar."),
+    ('kwh_exporterat_med_förlust', "{} kWh exporterades vid negativa priser."),
+    ('kostnad_negativ_export_sek', "Exportkostnad: -{} SEK."),
+    ('zap_negativa_timmar', "Exportstyrning kan optimera {} timmar."),
+    ('zap_export_optimerad_kwh', "Potential att optimera {} kWh export."),
+)
+_FALLBACK_ZAP_KEYS = ('zap_negativa_timmar', 'zap_export_optimerad_kwh')
+_FALLBACK_NO_ZAP = "Intelligent exportstyrning kan förbättra resultatet."
+# Tags the manual fallback so callers can tell it from a real AI answer
+FALLBACK_MARKER = "Reservförklaring"
+
+
+def is_fallback_text(text: Optional[str]) -> bool:
+    """True if text is the manual fallback rather than an AI answer."""
+    return bool(text) and f"({FALLBACK_MARKER} – " in text
+
+
+_THOUSANDS_TABLE = str.maketrans(',', ' ')
+_DECIMAL_TABLE = str.maketrans('.', ',')
+
+
+def _fmt_fact(v: Any) -> str:
+    if isinstance(v, int):
+        return format(v, ',').translate(_THOUSANDS_TABLE)
+    if isinstance(v, float):
+        return format(v, '.2f').rstrip('0').rstrip('.').translate(_DECIMAL_TABLE)
+    return str(v)
+
+
+@lru_cache(maxsize=256)
+def _facts_bullet(items: tuple) -> str:
+    """Bullet line for the frozen form of a facts dict: sorted (key, type,
+    value) triples. The type is part of the cache key because e.g. 1000 and
+    1000.0 hash equal but are formatted differently."""
+    facts = {k: v for k, _, v in items}
+
+    # Make totals absolutely clear and never say zero if there are problems
+    prod_val = facts.get('produktion_kwh', 0)
+    rev_val = facts.get('intakter_sek', 0)
+
+    # Only show totals if they make sense with the negative data
+    if prod_val > 0 and 'timmar_som_kostat_dig' in facts:
+        bits = [f"Årsproduktion {_fmt_fact(prod_val)} kWh", f"totala intäkter {_fmt_fact(rev_val)} SEK"]
+    else:
+        bits = [f"Anläggning med produktion och intäkter enligt data"]
+
+    # EXPORT FOCUS - clearly mark these as export-specific
+    if 'timmar_som_kostat_dig' in facts:
+        bits.append(f"{_fmt_fact(facts['timmar_som_kostat_dig'])} timmar då export kostade pengar")
+    if 'kwh_exporterat_med_förlust' in facts:
+        bits.append(f"{_fmt_fact(facts['kwh_exporterat_med_förlust'])} kWh exporterat vid negativa priser")
+    if 'andel_olönsam_export_pct' in facts:
+        bits.append(f"{_fmt_fact(facts['andel_olönsam_export_pct'])}% av exporten var olönsam")
+
+    # OPTIMIZATION POTENTIAL
+    if 'zap_negativa_timmar' in facts:
+        bits.append(f"Exportstyrning kan optimera {_fmt_fact(facts['zap_negativa_timmar'])} timmar")
+    if 'zap_export_optimerad_kwh' in facts:
+        bits.append(f"Styrning kan optimera {_fmt_fact(facts['zap_export_optimerad_kwh'])} kWh export")
+    if 'zap_dagar_drabbade' in facts:
+        bits.append(f"Påverkan kan minskas {_fmt_fact(facts['zap_dagar_drabbade'])} dagar")
+
+    # Traditional metrics (lower priority)
+    if 'andel_neg_timmar_pct' in facts:
+        bits.append(f"{_fmt_fact(facts['andel_neg_timmar_pct'])}% timmar ≤0 SEK")
+    if 'timing_rabatt_pct' in facts:
+        bits.append(f"marknadstiming {_fmt_fact(facts['timing_rabatt_pct'])}% avvikelse")
+    return '; '.join(bits)
+
+
 class AIExplainer:
     """Generate Swedish explanation using direct HTTP (requests) via OpenRouter."""
 
@@ -17,207 +362,405 @@ class AIExplainer:
 
     def __init__(self):
         if not os.getenv('OPENAI_API_KEY'):
-            try:
-                load_dotenv()
-            except Exception:
-                pass
+            _ensure_dotenv()
+        # Settings are read once here rather than from os.environ on every call
+        self.api_key = os.getenv('OPENAI_API_KEY')
+        self.timeout_s = _env_number('OPENAI_TIMEOUT', 40.0)
+        self.debug = os.getenv('OPENAI_DEBUG_EXPLAINER') == '1'
+        self.concurrency = _env_number('OPENAI_CONCURRENCY', 8, int)
+        self.rpm = _env_number('OPENAI_RPM', 500, int)
+        self.use_batch = os.getenv('OPENAI_USE_BATCH') == '1'
+        self.skip_trivial = os.getenv('OPENAI_SKIP_TRIVIAL') == '1'
         override = os.getenv('OPENAI_EXPLAINER_MODEL')
         self.model = override if override else self.DEFAULT_MODEL
         self.base_url = os.getenv('OPENAI_BASE_URL', self.DEFAULT_BASE_URL)
+        # prompt_cache_key is an OpenAI extension; other providers may reject it
+        self.send_prompt_cache_key = 'api.openai.com' in self.base_url
+        # URLs and request headers are built once, not on every call
+        self._api_base = self.base_url.rstrip('/')
+        self._chat_url = f"{self._api_base}/chat/completions"
+        self._headers: Optional[Dict[str, str]] = None
+        self._stream_headers: Optional[Dict[str, str]] = None
 
     def explain_storytelling(self, payload: Dict[str, Any]) -> str:
-        if not os.getenv('OPENAI_API_KEY'):
+        if not self._get_api_key():
             return "AI-förklaring kräver OPENAI_API_KEY."
 
-        hero = payload.get('hero', {}) or {}
-        counterfactuals = hero.get('counterfactuals') or {}
-        # Focus only on export optimization, no battery calculations
-
-        # --- Extract metrics with focus on pain points ---
-        # Traditional metrics
-        prod = float(hero.get('production_kwh') or 0)
-        rev = float(hero.get('revenue_sek') or 0)
-        neg_val = float(hero.get('negative_value_sek') or 0)
-        neg_share = float(hero.get('share_non_positive_during_production_pct') or 0)
-        timing_disc = float(hero.get('timing_discount_pct') or 0)
-        delta_if_floor = float(counterfactuals.get('delta_sek') or 0)
-        lost_energy_at_floor0 = counterfactuals.get('lost_energy_kwh_at_floor_0')
-        
-        # NEW: Extract Swedish pain-focused metrics
-        export_förluster = hero.get('export_förluster', {})
-        zap_lösning = hero.get('zap_lösning', {})
-        timmar_kostat = export_förluster.get('timmar_som_kostat_dig', 0)
-        kwh_förlust = export_förluster.get('kwh_exporterat_med_förlust', 0)
-        procent_olönsam = export_förluster.get('andel_olönsam_export_pct', 0)
-        kostnad_export = export_förluster.get('kostnad_negativ_export_sek', 0)
-        zap_besparing = zap_lösning.get('besparing_per_år_sek', 0)
-        zap_månader = zap_lösning.get('återbetalningstid', {}).get('månader', 0)
-
-        # Prioritize emotional impact facts
-        facts: Dict[str, Any] = {
-            'produktion_kwh': round(prod, 1),
-            'intakter_sek': round(rev, 0),
-        }
-        
-        # LEAD WITH PAIN POINTS - updated for export focus
-        if timmar_kostat > 0:
-            facts['timmar_som_kostat_dig'] = int(timmar_kostat)
-        if kwh_förlust > 0:
-            facts['kwh_exporterat_med_förlust'] = round(kwh_förlust, 1)
-        if procent_olönsam > 0:
-            facts['andel_olönsam_export_pct'] = round(procent_olönsam, 1)
-        if kostnad_export > 0:
-            facts['kostnad_negativ_export_sek'] = round(kostnad_export, 0)
-        
-        # ZAP SOLUTION FACTS - Focus on export optimization
-        zap_export = zap_lösning.get('export_under_negativa_priser', {})
-        if zap_export.get('timmar', 0) > 0:
-            facts['zap_negativa_timmar'] = zap_export.get('timmar', 0)
-        if zap_export.get('kwh', 0) > 0:
-            facts['zap_export_optimerad_kwh'] = round(zap_export.get('kwh', 0), 1)
-        if zap_export.get('dagar_drabbade', 0) > 0:
-            facts['zap_dagar_drabbade'] = zap_export.get('dagar_drabbade', 0)
-            
-        # Traditional metrics (lower priority)
-        if neg_share > 0:
-            facts['andel_neg_timmar_pct'] = round(neg_share, 1)
-        if timing_disc != 0:
-            facts['timing_rabatt_pct'] = round(timing_disc, 1)
-        if lost_energy_at_floor0:
-            facts['energi_vid_golv0_kwh'] = round(float(lost_energy_at_floor0), 1)
-
+        facts = self._build_facts(payload)
+        trivial = self._trivial_text(facts)
+        if trivial is not None:
+            return trivial
+        cache_key = self._cache_key(facts)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
         bullet_line = self._facts_to_bullet_line(facts)
         prompt = self._build_prompt(bullet_line, facts)
 
         # --- Attempt with retries (handles transient timeouts/connection resets) ---
-        max_attempts = 2
-        backoff = 2.0
+        # Decorrelated-jitter backoff; a server Retry-After hint is a lower bound
+        max_attempts = 3
+        base_delay, max_delay = 1.0, 10.0
+        delay = base_delay
         last_error: Optional[str] = None
         for attempt in range(1, max_attempts + 1):
+            retry_after: Optional[float] = None
             try:
                 ai_text = self._call_openai(prompt)
                 if ai_text:
-                    return ai_text.strip()
+                    ai_text = ai_text.strip()
+                    llm_cache.set(cache_key, ai_text)
+                    return ai_text
                 last_error = 'tomt AI-svar'
             except Exception as e:
                 msg = str(e)
                 last_error = msg
+                retry_after = getattr(e, 'retry_after', None)
                 # If timeout, shorten prompt and retry quickly
                 if 'Read timed out' in msg or 'Timeout' in msg:
                     prompt = self._short_prompt(bullet_line)
-                else:
+                elif msg.startswith('cached:'):
+                    # Already negatively cached; don't extend its TTL
+                    break
+                elif any(k in msg for k in _NO_RETRY_KEYS):
                     # For auth/model/quota errors, break early
-                    if any(k in msg for k in ('401', 'auth', 'quota', 'model_not_found', '429')):
-                        break
+                    _neg_cache_set(self._map_reason(msg), retry_after)
+                    break
             if attempt < max_attempts:
-                time.sleep(backoff)
+                delay = min(max_delay, random.uniform(base_delay, delay * 3))
+                if retry_after is not None:
+                    if retry_after > max_delay:
+                        break
+                    delay = max(delay, retry_after)
+                time.sleep(delay)
         # Fallback
         reason = (last_error or 'okänt')[:80]
         mapped = self._map_reason(reason)
         return self._manual_fallback(facts, reason=mapped)
 
+    async def explain_storytelling_async(self, payload: Dict[str, Any]) -> str:
+        """Awaitable explain_storytelling for async callers.
+
+        The blocking HTTP call runs in the default thread pool, so several
+        explanations can be awaited concurrently over the shared session.
+        """
+        return await asyncio.to_thread(self.explain_storytelling, payload)
+
+    async def explain_many_concurrent(self, payloads: List[Dict[str, Any]], max_concurrency: int = 10,
+                                      rpm: int = 500) -> List[str]:
+        """Explain many payloads concurrently, returning texts in input order.
+
+        At most max_concurrency requests are in flight, and request starts are
+        spaced 60/rpm seconds apart so bursts stay under the provider's
+        requests-per-minute limit.
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        interval = 60.0 / rpm if rpm > 0 else 0.0
+        pacing_lock = asyncio.Lock()
+        next_start = 0.0
+
+        async def one(payload: Dict[str, Any]) -> str:
+            nonlocal next_start
+            async with semaphore:
+                async with pacing_lock:
+                    now = time.monotonic()
+                    wait = next_start - now
+                    next_start = max(now, next_start) + interval
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                return await self.explain_storytelling_async(payload)
+
+        return list(await asyncio.gather(*(one(p) for p in payloads)))
+
+    def explain_many(self, payloads: List[Dict[str, Any]]) -> List[str]:
+        """Blocking form of explain_many_concurrent for scripts and the CLI.
+
+        Concurrency and pacing come from OPENAI_CONCURRENCY (default 8) and
+        OPENAI_RPM (default 500). Not for use inside a running event loop.
+        With OPENAI_USE_BATCH=1 the payloads go through the Batch API
+        instead (half price, but may take hours; see explain_batch).
+        """
+        if self.use_batch:
+            return self.explain_batch(payloads)
+        return asyncio.run(self.explain_many_concurrent(payloads, self.concurrency, self.rpm))
+
+    def explain_storytelling_stream(self, payload: Dict[str, Any], max_words: Optional[int] = None,
+                                    first_paragraph: bool = False) -> Iterator[str]:
+        """Like explain_storytelling but yields text chunks as the model produces them.
+
+        Falls back to yielding the full non-streamed result if the stream fails
+        before any text has been produced (or straight to the manual fallback
+        for auth, quota and open-circuit errors, which a retry would repeat). With max_words the stream is closed
+        once that many words have arrived; with first_paragraph it is closed at
+        the first blank line after some text (the prompt asks for a single
+        paragraph). A cut text is not cached.
+        """
+        if not self._get_api_key():
+            yield "AI-förklaring kräver OPENAI_API_KEY."
+            return
+        facts = self._build_facts(payload)
+        trivial = self._trivial_text(facts)
+        if trivial is not None:
+            yield trivial
+            return
+        cache_key = self._cache_key(facts)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+        bullet_line = self._facts_to_bullet_line(facts)
+        prompt = self._build_prompt(bullet_line, facts)
+        chunks = []
+        words = 0
+        seen = ''
+        stream = self._call_openai_stream(prompt)
+        try:
+            for chunk in stream:
+                if first_paragraph:
+                    start = len(seen)
+                    seen += chunk
+                    cut = seen.find('\n\n', max(0, start - 1))
+                    while cut != -1 and not seen[:cut].strip():
+                        cut = seen.find('\n\n', cut + 1)
+                    if cut != -1:
+                        head = seen[start:cut]
+                        if head:
+                            chunks.append(head)
+                            yield head
+                        return
+                chunks.append(chunk)
+                yield chunk
+                if max_words:
+                    # A chunk that doesn't start with whitespace continues the previous word
+                    words += len(chunk.split())
+                    if words and chunk[:1].strip() and len(chunks) > 1 and chunks[-2][-1:].strip():
+                        words -= 1
+                    if words >= max_words:
+                        return
+        except Exception as e:
+            if chunks:
+                logger.warning(f"AI stream interrupted: {e}")
+                return
+            msg = str(e)
+            if msg.startswith('cached:') or any(k in msg for k in _NO_RETRY_KEYS):
+                # A blocking retry would hit the same auth/quota/circuit error
+                if not msg.startswith('cached:'):
+                    _neg_cache_set(self._map_reason(msg), getattr(e, 'retry_after', None))
+                yield self._manual_fallback(facts, reason=self._map_reason(msg))
+                return
+            logger.info(f"AI stream failed, falling back to blocking call: {e}")
+            yield self.explain_storytelling(payload)
+            return
+        finally:
+            # Closes the HTTP response if we stopped early
+            stream.close()
+        if not chunks:
+            yield self.explain_storytelling(payload)
+            return
+        text = ''.join(chunks).strip()
+        if text:
+            llm_cache.set(cache_key, text)
+
+    # ---------------- Batch API (offline bulk runs) ----------------
+    # Requires an OpenAI-compatible base URL that implements /files and
+    # /batches (e.g. OPENAI_BASE_URL=https://api.openai.com/v1); OpenRouter
+    # does not. Batched requests are billed at half price but may take up to
+    # the completion window to finish.
+
+    def submit_batch(self, payloads: List[Dict[str, Any]]) -> str:
+        """Upload one chat request per payload and start a batch. Returns the batch id."""
+        api_key = self._get_api_key()
+        if not api_key:
+            raise RuntimeError("AI-förklaring kräver OPENAI_API_KEY.")
+        lines = []
+        for i, payload in enumerate(payloads):
+            facts = self._build_facts(payload)
+            prompt = self._build_prompt(self._facts_to_bullet_line(facts), facts)
+            lines.append(json.dumps({
+                "custom_id": str(i),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self._chat_body(prompt)
+            }, ensure_ascii=False))
+        base = self._api_base
+        headers = {"Authorization": f"Bearer {api_key}"}
+        session = _get_session()
+
+        r = session.post(
+            f"{base}/files", headers=headers, data={"purpose": "batch"},
+            files={"file": ("explanations.jsonl", "\n".join(lines).encode('utf-8'), "application/jsonl")},
+            timeout=self.timeout_s,
+        )
+        if r.status_code != 200:
+            raise RuntimeError(f"HTTP {r.status_code}: {r.text[:180]}")
+        r = session.post(
+            f"{base}/batches", headers=headers,
+            json={"input_file_id": r.json()["id"], "endpoint": "/v1/chat/completions", "completion_window": "24h"},
+            timeout=self.timeout_s,
+        )
+        if r.status_code != 200:
+            raise RuntimeError(f"HTTP {r.status_code}: {r.text[:180]}")
+        batch_id = r.json()["id"]
+        logger.info(f"Submitted explanation batch {batch_id} with {len(lines)} requests")
+        return batch_id
+
+    def poll_batch(self, batch_id: str) -> Optional[Dict[str, str]]:
+        """Return {custom_id: text} once the batch has completed, otherwise None."""
+        api_key = self._get_api_key()
+        if not api_key:
+            raise RuntimeError("AI-förklaring kräver OPENAI_API_KEY.")
+        base = self._api_base
+        headers = {"Authorization": f"Bearer {api_key}"}
+        session = _get_session()
+
+        r = session.get(f"{base}/batches/{batch_id}", headers=headers, timeout=self.timeout_s)
+        if r.status_code != 200:
+            raise RuntimeError(f"HTTP {r.status_code}: {r.text[:180]}")
+        batch = r.json()
+        status = batch.get("status")
+        if status in ("failed", "expired", "cancelled"):
+            raise RuntimeError(f"batch {status}")
+        if status != "completed":
+            return None
+        results: Dict[str, str] = {}
+        output_file_id = batch.get("output_file_id")
+        if not output_file_id:
+            return results
+        r = session.get(f"{base}/files/{output_file_id}/content", headers=headers, timeout=self.timeout_s)
+        if r.status_code != 200:
+            raise RuntimeError(f"HTTP {r.status_code}: {r.text[:180]}")
+        for line in r.text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            body = (record.get("response") or {}).get("body") or {}
+            choices = body.get("choices") or []
+            content = choices[0].get("message", {}).get("content") if choices else None
+            if content:
+                results[record["custom_id"]] = content.strip()
+        return results
+
+    def explain_batch(self, payloads: List[Dict[str, Any]], poll_interval: float = 30.0,
+                      max_wait: float = 24 * 3600) -> List[str]:
+        """Explain many payloads through the Batch API, blocking until done.
+
+        Results are aligned with the input order. Payloads already in the
+        response cache are not resubmitted; any payload without a batch
+        result gets the manual fallback text.
+        """
+        if not self._get_api_key():
+            return ["AI-förklaring kräver OPENAI_API_KEY."] * len(payloads)
+        facts_list = [self._build_facts(p) for p in payloads]
+        keys = [self._cache_key(f) for f in facts_list]
+        texts: List[Optional[str]] = [self._trivial_text(f) or llm_cache.get(k)
+                                      for f, k in zip(facts_list, keys)]
+        pending = [i for i, t in enumerate(texts) if t is None]
+
+        reason = 'batch'
+        if pending:
+            try:
+                batch_id = self.submit_batch([payloads[i] for i in pending])
+                deadline = time.monotonic() + max_wait
+                results = self.poll_batch(batch_id)
+                while results is None and time.monotonic() < deadline:
+                    time.sleep(poll_interval)
+                    results = self.poll_batch(batch_id)
+                for j, i in enumerate(pending):
+                    text = (results or {}).get(str(j))
+                    if text:
+                        texts[i] = text
+                        llm_cache.set(keys[i], text)
+                if results is None:
+                    reason = 'timeout'
+            except Exception as e:
+                logger.warning(f"Explanation batch failed: {e}")
+                reason = self._map_reason(str(e)[:80])
+        return [t if t is not None else self._manual_fallback(facts_list[i], reason=reason)
+                for i, t in enumerate(texts)]
+
     # ---------------- Internal helpers ----------------
+    def _get_api_key(self) -> Optional[str]:
+        # The key may be exported after construction; re-check only while unset
+        if not self.api_key:
+            self.api_key = os.getenv('OPENAI_API_KEY')
+        return self.api_key
+
+    def _build_facts(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        hero = payload.get('hero', {}) or {}
+        return {key: fmt(v) for key, path, fmt, keep in _FACT_SPEC if keep(v := _walk(hero, path))}
+
+    def _trivial_text(self, facts: Dict[str, Any]) -> Optional[str]:
+        """Fixed text for payloads with no negative-price export at all.
+
+        Only with OPENAI_SKIP_TRIVIAL=1: when the facts hold nothing but the
+        totals there is nothing for the model to explain.
+        """
+        if not self.skip_trivial or not set(facts) <= _TRIVIAL_FACTS:
+            return None
+        return (
+            f"Anläggningen producerade {_fmt_fact(facts.get('produktion_kwh', 0))} kWh med totala intäkter "
+            f"{_fmt_fact(facts.get('intakter_sek', 0))} SEK. Ingen export skedde vid negativa spotpriser under "
+            "perioden, så exporten har inte kostat dig pengar. Med 60-öringens bortfall 2025/2026 och allt fler "
+            "timmar med negativa priser kan exportstyrning ändå bli värdefull framöver."
+        )
+
+    def _cache_key(self, facts: Dict[str, Any]) -> str:
+        # The template hash keeps persisted entries from outliving a prompt change
+        blob = json.dumps({"m": self.model, "p": _PROMPT_CACHE_KEY, "f": facts}, sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
     def _facts_to_bullet_line(self, facts: Dict[str, Any]) -> str:
-        def fmt(v):
-            if isinstance(v, int):
-                return f"{v:,}".replace(',', ' ')
-            if isinstance(v, float):
-                sval = f"{v:.2f}".rstrip('0').rstrip('.')
-                return sval.replace('.', ',')
-            return str(v)
-        
-        # Make totals absolutely clear and never say zero if there are problems
-        prod_val = facts.get('produktion_kwh', 0)
-        rev_val = facts.get('intakter_sek', 0) 
-        
-        # Only show totals if they make sense with the negative data
-        if prod_val > 0 and 'timmar_som_kostat_dig' in facts:
-            bits = [f"Årsproduktion {fmt(prod_val)} kWh", f"totala intäkter {fmt(rev_val)} SEK"]
-        else:
-            bits = [f"Anläggning med produktion och intäkter enligt data"]
-        
-        # EXPORT FOCUS - clearly mark these as export-specific
-        if 'timmar_som_kostat_dig' in facts:
-            bits.append(f"{fmt(facts['timmar_som_kostat_dig'])} timmar då export kostade pengar")
-        if 'kwh_exporterat_med_förlust' in facts:
-            bits.append(f"{fmt(facts['kwh_exporterat_med_förlust'])} kWh exporterat vid negativa priser")
-        if 'andel_olönsam_export_pct' in facts:
-            bits.append(f"{fmt(facts['andel_olönsam_export_pct'])}% av exporten var olönsam")
-            
-        # OPTIMIZATION POTENTIAL
-        if 'zap_negativa_timmar' in facts:
-            bits.append(f"Exportstyrning kan optimera {fmt(facts['zap_negativa_timmar'])} timmar")
-        if 'zap_export_optimerad_kwh' in facts:
-            bits.append(f"Styrning kan optimera {fmt(facts['zap_export_optimerad_kwh'])} kWh export")
-        if 'zap_dagar_drabbade' in facts:
-            bits.append(f"Påverkan kan minskas {fmt(facts['zap_dagar_drabbade'])} dagar")
-            
-        # Traditional metrics (lower priority)
-        if 'andel_neg_timmar_pct' in facts:
-            bits.append(f"{fmt(facts['andel_neg_timmar_pct'])}% timmar ≤0 SEK")
-        if 'timing_rabatt_pct' in facts:
-            bits.append(f"marknadstiming {fmt(facts['timing_rabatt_pct'])}% avvikelse")
-        return '; '.join(bits)
+        items = tuple(sorted((k, type(v), v) for k, v in facts.items()))
+        try:
+            return _facts_bullet(items)
+        except TypeError:  # unhashable value, format without caching
+            return _facts_bullet.__wrapped__(items)
 
     def _build_prompt(self, bullet_line: str, facts: Dict[str, Any]) -> str:
-        # Significantly shortened prompt as requested
-        has_zap_data = 'zap_negativa_timmar' in facts or 'zap_export_optimerad_kwh' in facts
-        
-        base_prompt = (
-            f"Skriv kortfattad svensk analys (max 120 ord) om export vid negativa spotpriser. Data: {bullet_line}. "
-            "Viktigt: Detta baseras på spotpris exklusive moms och påslag - faktiskt resultat varierar med elbolag. "
-            "Fokusera på: Hur stor andel av exporten skedde vid negativa priser. "
-            "Förklara att negativa priser = systemöverskott av förnybar energi där export kostar pengar. "
-            "60-öringens bortfall 2025/2026 förvärrar detta. "
-            "Lösning: Exportstyrning när priserna är negativa. "
-            "Skriv som löpande text, inga listor eller bullets."
-        )
-        
-        return base_prompt
+        return _PROMPT_TMPL.substitute(bullet_line=bullet_line)
 
     def _short_prompt(self, bullet_line: str) -> str:
-        return (
-            f"Kort teknisk analys (1 stycke, max 120 ord) av solcellsanläggning: {bullet_line}. "
-            "Tolkning: 'produktion' och 'intäkter' = totala värden, 'timmar som kostade' = negativa exportperioder. "
-            "Fokus: marknadsvillkor, systemöverskott, exportkostnader. "
-            "Nämn 60-öringens bortfall 2025/2026. Endast faktiska siffror."
-        )
+        return _SHORT_PROMPT_TMPL.substitute(bullet_line=bullet_line)
 
     def _map_reason(self, reason: str) -> str:
-        if 'auth' in reason or '401' in reason:
-            return 'auth'
-        if '429' in reason or 'quota' in reason:
-            return 'kvot'
-        if 'model' in reason:
-            return 'modell'
-        if 'timeout' in reason.lower() or 'timed out' in reason.lower():
-            return 'timeout'
-        return reason
+        return _reason_label(reason)
 
-    def _call_openai(self, prompt: str) -> str | None:
-        api_key = os.getenv('OPENAI_API_KEY')
-        if not api_key:
-            return None
-        url = f"{self.base_url.rstrip('/')}/chat/completions"
-        payload = {
+    def _chat_headers(self, stream: bool = False) -> Dict[str, str]:
+        # Only called once the API key is known; it does not change afterwards
+        if self._headers is None:
+            self._headers = {
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json",
+                "HTTP-Referer": "https://sourceful.energy",
+                "X-Title": "Negativa Prisanalyseraren"
+            }
+            self._stream_headers = {**self._headers, "Accept": "text/event-stream"}
+        return self._stream_headers if stream else self._headers
+
+    def _chat_body(self, prompt: str) -> Dict[str, Any]:
+        body: Dict[str, Any] = {
             "model": self.model,
             "messages": [{"role": "user", "content": prompt}]
         }
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "https://sourceful.energy",
-            "X-Title": "Negativa Prisanalyseraren"
-        }
-        timeout_s = float(os.getenv('OPENAI_TIMEOUT', '40'))
-        r = requests.post(url, headers=headers, data=json.dumps(payload), timeout=timeout_s)
+        if self.send_prompt_cache_key:
+            body["prompt_cache_key"] = _PROMPT_CACHE_KEY
+        return body
+
+    def _call_openai(self, prompt: str) -> str | None:
+        if not self._get_api_key():
+            return None
+        payload = self._chat_body(prompt)
+        _neg_cache_check()
+        r = _guarded_post(self._chat_url, headers=self._chat_headers(), data=_json_dumps(payload),
+                          timeout=self.timeout_s)
         if r.status_code != 200:
-            raise RuntimeError(f"HTTP {r.status_code}: {r.text[:180]}")
+            raise AIHTTPError(r)
+        _neg_cache_clear()
         try:
-            data = r.json()
+            data = _json_loads(r.content)
         except Exception as e:
             raise RuntimeError(f"JSON decode misslyckades: {e}")
-        if os.getenv('OPENAI_DEBUG_EXPLAINER') == '1':
+        if self.debug:
             logger.debug('HTTP JSON keys: %s', list(data.keys()))
         # Standard chat completions response format
         choices = data.get('choices', [])
@@ -225,35 +768,53 @@ class AIExplainer:
             return choices[0]['message']['content']
         return None
 
+    def _call_openai_stream(self, prompt: str) -> Iterator[str]:
+        """Stream a chat completion (server-sent events) and yield content deltas."""
+        if not self._get_api_key():
+            return
+        payload = self._chat_body(prompt)
+        payload["stream"] = True
+        _neg_cache_check()
+        with _guarded_post(self._chat_url, headers=self._chat_headers(stream=True),
+                           data=_json_dumps(payload), timeout=self.timeout_s, stream=True) as r:
+            if r.status_code != 200:
+                raise AIHTTPError(r)
+            for line in r.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                data = line[5:].strip()
+                if data == '[DONE]':
+                    break
+                try:
+                    event = _json_loads(data)
+                except ValueError:
+                    continue
+                choices = event.get('choices') or []
+                delta = choices[0].get('delta', {}).get('content') if choices else None
+                if delta:
+                    yield delta
+
     def _manual_fallback(self, facts: Dict[str, Any], reason: str) -> str:
         """Produce a simple deterministic Swedish summary if AI fails."""
-        try:
-            prod = facts.get('produktion_kwh')
-            rev = facts.get('intakter_sek')
-            timmar_kostat = facts.get('timmar_som_kostat_dig')
-            kwh_förlust = facts.get('kwh_exporterat_med_förlust')
-            kostnad = facts.get('kostnad_negativ_export_sek')
-            zap_timmar = facts.get('zap_negativa_timmar')
-            zap_kwh = facts.get('zap_export_optimerad_kwh')
-            
-            parts = [f"Anläggningen producerade {prod} kWh med totala intäkter {rev} SEK."]
-            
-            if timmar_kostat:
-                parts.append(f"Under {timmar_kostat} timmar kostade exporten pengar.")
-            if kwh_förlust:
-                parts.append(f"{kwh_förlust} kWh exporterades vid negativa priser.")
-            if kostnad:
-                parts.append(f"Exportkostnad: -{kostnad} SEK.")
-                
-            if zap_timmar or zap_kwh:
-                if zap_timmar:
-                    parts.append(f"Exportstyrning kan optimera {zap_timmar} timmar.")
-                if zap_kwh:
-                    parts.append(f"Potential att optimera {zap_kwh} kWh export.")
-            else:
-                parts.append("Intelligent exportstyrning kan förbättra resultatet.")
-                
-            parts.append(f"(Reservförklaring – {reason})")
-            return ' '.join(parts)
-        except Exception:
-            return f"Förklaring misslyckades ({reason})."
\ No newline at end of file
+        parts = [f"Anläggningen producerade {facts.get('produktion_kwh')} kWh "
+                 f"med totala intäkter {facts.get('intakter_sek')} SEK."]
+        parts += [tmpl.format(facts[key]) for key, tmpl in _FALLBACK_SENTENCES if facts.get(key)]
+        if not any(facts.get(key) for key in _FALLBACK_ZAP_KEYS):
+            parts.append(_FALLBACK_NO_ZAP)
+        parts.append(f"({FALLBACK_MARKER} – {reason})")
+        return ' '.join(parts)
+
+
+_EXPLAINER: Optional[AIExplainer] = None
+_EXPLAINER_LOCK = threading.Lock()
+
+
+def get_explainer() -> AIExplainer:
+    """Process-wide AIExplainer, so settings are resolved once and the
+    session, caches and breaker are shared by every caller."""
+    global _EXPLAINER
+    if _EXPLAINER is None:
+        with _EXPLAINER_LOCK:
+            if _EXPLAINER is None:
+                _EXPLAINER = AIExplainer()
+    return _EXPLAINER
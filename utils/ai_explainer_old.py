@@ -1,36 +1,195 @@
 import os
 import logging
-import json
+import hashlib
+import random
 import time
+from functools import lru_cache
 from typing import Any, Dict, Optional
-from dotenv import load_dotenv
-import requests
+from . import llm_cache
+from .ai_explainer import (
+    FALLBACK_MARKER, _ensure_dotenv, _env_number, _fmt_fact, _breaker_call, _guarded_post, _json_dumps,
+    _json_loads, _reason_label,
+)
 
 logger = logging.getLogger(__name__)
 
+# httpx is optional: with it (and h2 for HTTP/2) parallel calls share one
+# multiplexed connection; otherwise the pooled requests session is used
+try:
+    import httpx
+    HAS_HTTPX = True
+except ImportError:
+    HAS_HTTPX = False
+
+try:
+    import h2  # noqa: F401
+    HAS_H2 = True
+except ImportError:
+    HAS_H2 = False
+
+
+@lru_cache(maxsize=1)
+def _get_client() -> "httpx.Client":
+    return httpx.Client(
+        http2=HAS_H2,
+        timeout=httpx.Timeout(40.0, connect=5.0),
+        limits=httpx.Limits(max_keepalive_connections=8, max_connections=16),
+    )
+
+
+def _post(url: str, headers: Dict[str, str], body: bytes, timeout: float):
+    """POST via httpx when available, else requests; both guarded by the circuit breaker."""
+    if not HAS_HTTPX:
+        return _guarded_post(url, headers=headers, data=body, timeout=timeout)
+    try:
+        return _breaker_call(lambda: _get_client().post(url, headers=headers, content=body, timeout=timeout))
+    except httpx.TimeoutException as e:
+        # Same wording the retry loop and reason mapping look for
+        raise RuntimeError(f"Timeout: {e}") from e
+
+
+# Static instructions, sent in the Responses API `instructions` field so the
+# provider can cache them; only the data line (the `input`) varies per call
+_PROMPT_BASE = (
+    "Skriv kort svensk analys (max 200 ord) för villaägare om solceller och negativa priser. "
+    "VIKTIGT: Negativa timmar/kWh är del av total produktion, inte hela. Säg aldrig '0 kWh totalt' om negativa perioder finns. "
+    "Förklara: 1) Negativa priser = systemöverskott, 2) Export kostar pengar, 3) 60-öringen upphör 2025/2026. "
+    "- 'Årsproduktion X kWh' och 'totala intäkter Y SEK' är separata från 'Z timmar utan ersättning under negativa priser' "
+    "- Negativa timmar/kWh är DELMÄNGD av total produktion, inte hela produktionen! "
+    "STRUKTUR för analysen: "
+    "1. Börja med teknisk analys av marknadsvillkoren: "
+    "   - Förklara att negativa priser uppstår vid systemöverskott av förnybar energi "
+    "   - Kvantifiera påverkan: X timmar utan ersättning, Y kWh producerat vid olönsamma villkor "
+    "   - Marknadstiming visar systematisk avvikelse från optimala exporttidpunkter "
+    "2. Förklara ekonomiska och systemmässiga konsekvenser: "
+    "   - Negativa priser innebär betalning för export eller noll-ersättning "
+    "   - Export vid överskott förvärrar elnätets obalans och driver ytterligare prisfall "
+    "   - VIKTIGT: Nämna att 60-öringen (skattereduktion) upphör 2025/2026, vilket gör negativa priser ännu mer kostsamma "
+    "   - Kommande effekttariffer kommer ytterligare best raffa export vid hög belastning "
+)
+_PROMPT_ZAP_TAIL = (
+    "\n\n3. Avsluta med lösningen - intelligent exportstyrning: "
+    "   - Automatisk pausning av export vid negativa priser skyddar både ekonomi och nätstabilitet "
+    "   - Kvantifiera: X timmar och Y kWh kan optimeras bort från olönsam produktion "
+    "   - Systemet förbereder anläggningen för effekttariffer och framtida marknadsvillkor "
+    "   - Bidrar till ett stabilare elnät genom att minska överproduktion vid kritiska tidpunkter "
+)
+_PROMPT_GENERIC_TAIL = (
+    "\n\n3. Avsluta med att intelligent exportstyrning kan optimera anläggningen för bättre marknadsvillkor och nätstabilitet. "
+)
+_PROMPT_FOOTER = "\nAnvänd endast faktiska data. Ton: saklig, professionell och utbildande utan säljtryck."
+_INSTRUCTIONS_WITH_ZAP = _PROMPT_BASE + _PROMPT_ZAP_TAIL + _PROMPT_FOOTER
+_INSTRUCTIONS_GENERIC = _PROMPT_BASE + _PROMPT_GENERIC_TAIL + _PROMPT_FOOTER
+_PROMPT_INPUT = "Data: {bullet}."
+_SHORT_PROMPT = (
+    "Kort teknisk analys (1 stycke, max 120 ord) av solcellsanläggning: {bullet}. "
+    "Tolkning: 'produktion' och 'intäkter' = totala värden, 'timmar utan ersättning' = negativa prisperioder. "
+    "Fokus: marknadsvillkor, systemöverskott, ekonomisk påverkan. "
+    "Nämn 60-öringens bortfall 2025/2026. Endast faktiska siffror."
+)
+
+_FALLBACK_SENTENCES = (
+    ('timmar_arbetade_gratis', "Under {} timmar erhölls ingen marknadsetsättning."),
+    ('kwh_producerat_med_förlust', "{} kWh producerades vid negativa priser."),
+    ('kostnad_negativa_priser_sek', "Marknadspåverkan: -{} SEK."),
+    ('zap_negativa_timmar', "Exportstyrning kan optimera {} timmar."),
+    ('zap_producerat_gratis_kwh', "Potential att omdirigera {} kWh."),
+)
+_FALLBACK_ZAP_KEYS = ('zap_negativa_timmar', 'zap_producerat_gratis_kwh')
+_FALLBACK_NO_ZAP = "Intelligent styrning kan förbättra marknadsutfallet."
+
+def _iter_output_text(output):
+    """Yield the text pieces of a Responses API `output` list.
+
+    Items and blocks are decoded JSON, so malformed ones are skipped by
+    catching the lookup error instead of type-checking every level.
+    """
+    for item in output:
+        try:
+            kind = item['type']
+            if kind == 'message':
+                for block in item['content']:
+                    try:
+                        t = block['text']
+                        yield t if type(t) is str else (t.get('value') or t.get('text'))
+                    except (KeyError, TypeError, AttributeError):
+                        continue
+            elif kind in ('text', 'output_text'):
+                yield item['text']
+        except (KeyError, TypeError):
+            continue
+
+
+@lru_cache(maxsize=256)
+def _facts_bullet(items: tuple) -> str:
+    """Bullet line for the frozen form of a facts dict: sorted (key, type,
+    value) triples. The type is part of the cache key because e.g. 1000 and
+    1000.0 hash equal but are formatted differently."""
+    facts = {k: v for k, _, v in items}
+
+    # Make totals absolutely clear and never say zero if there are problems
+    prod_val = facts.get('produktion_kwh', 0)
+    rev_val = facts.get('intakter_sek', 0)
+
+    # Only show totals if they make sense with the negative data
+    if prod_val > 0 and 'timmar_arbetade_gratis' in facts:
+        bits = [f"Årsproduktion {_fmt_fact(prod_val)} kWh", f"totala intäkter {_fmt_fact(rev_val)} SEK"]
+    else:
+        bits = [f"Anläggning med produktion och intäkter enligt data"]
+
+    # MARKET IMPACT METRICS - clearly mark these as negative-period only
+    if 'timmar_arbetade_gratis' in facts:
+        bits.append(f"{_fmt_fact(facts['timmar_arbetade_gratis'])} timmar utan marknadsetsättning")
+    if 'kwh_producerat_med_förlust' in facts:
+        bits.append(f"{_fmt_fact(facts['kwh_producerat_med_förlust'])} kWh producerat vid negativa priser")
+    if 'procent_produktion_bortkastad' in facts:
+        bits.append(f"{_fmt_fact(facts['procent_produktion_bortkastad'])}% av produktion vid olönsamma villkor")
+    if 'kostnad_negativa_priser_sek' in facts:
+        bits.append(f"kostnad för negativa priser {_fmt_fact(facts['kostnad_negativa_priser_sek'])} SEK")
+    if 'dagar_med_negativ_påverkan' in facts:
+        bits.append(f"drabbades {_fmt_fact(facts['dagar_med_negativ_påverkan'])} dagar av negativa priser")
+
+    # OPTIMIZATION POTENTIAL
+    if 'zap_negativa_timmar' in facts:
+        bits.append(f"Exportstyrning kan optimera {_fmt_fact(facts['zap_negativa_timmar'])} timmar")
+    if 'zap_producerat_gratis_kwh' in facts:
+        bits.append(f"Styrning kan omdirigera {_fmt_fact(facts['zap_producerat_gratis_kwh'])} kWh")
+    if 'zap_dagar_drabbade' in facts:
+        bits.append(f"Påverkan kan minskas {_fmt_fact(facts['zap_dagar_drabbade'])} dagar")
+
+    # Traditional metrics (lower priority)
+    if 'andel_neg_timmar_pct' in facts:
+        bits.append(f"{_fmt_fact(facts['andel_neg_timmar_pct'])}% timmar ≤0 SEK")
+    if 'timing_rabatt_pct' in facts:
+        bits.append(f"marknadstiming {_fmt_fact(facts['timing_rabatt_pct'])}% avvikelse")
+    if 'prisgolv_potential_sek' in facts:
+        bits.append(f"prisgolv potential +{_fmt_fact(facts['prisgolv_potential_sek'])} SEK")
+    return '; '.join(bits)
+
+
 class AIExplainer:
     """Generate Swedish explanation using direct HTTP (requests) instead of OpenAI SDK."""
 
     def __init__(self):
         if not os.getenv('OPENAI_API_KEY'):
-            try:
-                load_dotenv()
-            except Exception:
-                pass
+            _ensure_dotenv()
         override = os.getenv('OPENAI_MODEL')
         self.model = override if override else 'gpt-5-mini'
         self.base_url = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1')
+        # Resolved once here instead of on every call
+        self.api_key = os.getenv('OPENAI_API_KEY')
+        self.timeout_s = _env_number('OPENAI_TIMEOUT', 40.0)
+        self.debug = os.getenv('OPENAI_DEBUG_EXPLAINER') == '1'
+        self.deadline_s = _env_number('OPENAI_DEADLINE', 45.0)
+        self._responses_url = f"{self.base_url.rstrip('/')}/responses"
+        self._headers: Optional[Dict[str, str]] = None
 
     def explain_storytelling(self, payload: Dict[str, Any]) -> str:
-        if not os.getenv('OPENAI_API_KEY'):
+        if not self._get_api_key():
             return "AI-förklaring kräver OPENAI_API_KEY."
 
         hero = payload.get('hero', {}) or {}
         counterfactuals = hero.get('counterfactuals') or {}
-        scenarios = (payload.get('scenarios') or {})
-        battery = scenarios.get('battery_shift') or {}
-        batt_sizes = battery.get('sizes_kwh', []) if battery else []
-        best_batt = max(batt_sizes, key=lambda x: x.get('delta_revenue_sek', 0)) if batt_sizes else None
 
         # --- Extract metrics with focus on pain points ---
         # Traditional metrics
@@ -49,8 +208,6 @@ class AIExplainer:
         kwh_förlust = investering_bloder.get('kwh_producerat_med_förlust', 0)
         procent_bortkastad = investering_bloder.get('procent_av_produktion_bortkastad', 0)
         dagar_påverkade = investering_bloder.get('dagar_med_negativ_påverkan', 0)
-        zap_besparing = zap_lösning.get('besparing_per_år_sek', 0)
-        zap_månader = zap_lösning.get('återbetalningstid', {}).get('månader', 0)
 
         # Prioritize emotional impact facts
         facts: Dict[str, Any] = {
@@ -86,24 +243,27 @@ class AIExplainer:
             facts['timing_rabatt_pct'] = round(timing_disc, 1)
         if delta_if_floor > 0:
             facts['prisgolv_potential_sek'] = round(delta_if_floor, 0)
-        if best_batt and (best_batt.get('delta_revenue_sek') or 0) > 0:
-            facts['batt_delta_sek'] = round(best_batt.get('delta_revenue_sek'), 0)
-            size_kwh = best_batt.get('size_kwh') or best_batt.get('size')
-            if size_kwh:
-                facts['batt_size_kwh'] = size_kwh
         if lost_energy_at_floor0:
             facts['energi_vid_golv0_kwh'] = round(float(lost_energy_at_floor0), 1)
 
         bullet_line = self._facts_to_bullet_line(facts)
-        prompt = self._build_prompt(bullet_line, facts)
+        instructions: Optional[str] = self._build_instructions(facts)
+        prompt = self._build_prompt(bullet_line)
 
         # --- Attempt with retries (handles transient timeouts/connection resets) ---
-        max_attempts = 2
-        backoff = 2.0
+        # All attempts and sleeps share one deadline, so the fallback is never
+        # later than OPENAI_DEADLINE seconds; sleeps are jittered
+        max_attempts = 3
+        backoff = 0.5
+        deadline = time.monotonic() + self.deadline_s
         last_error: Optional[str] = None
         for attempt in range(1, max_attempts + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                last_error = last_error or 'timeout'
+                break
             try:
-                ai_text = self._call_openai(prompt)
+                ai_text = self._call_openai(prompt, instructions, timeout=min(self.timeout_s, remaining))
                 if ai_text:
                     return ai_text.strip()
                 last_error = 'tomt AI-svar'
@@ -113,12 +273,17 @@ class AIExplainer:
                 # If timeout, shorten prompt and retry quickly
                 if 'Read timed out' in msg or 'Timeout' in msg:
                     prompt = self._short_prompt(bullet_line)
+                    instructions = None
                 else:
                     # For auth/model/quota errors, break early
-                    if any(k in msg for k in ('401', 'auth', 'quota', 'model_not_found', '429')):
+                    if any(k in msg for k in ('401', 'auth', 'quota', 'model_not_found', '429', 'circuit_open')):
                         break
             if attempt < max_attempts:
-                time.sleep(backoff)
+                sleep_for = min(backoff * (1 + random.random()), deadline - time.monotonic())
+                if sleep_for <= 0:
+                    break
+                time.sleep(sleep_for)
+                backoff *= 2
         # Fallback
         reason = (last_error or 'okänt')[:80]
         mapped = self._map_reason(reason)
@@ -126,187 +291,73 @@ class AIExplainer:
 
     # ---------------- Internal helpers ----------------
     def _facts_to_bullet_line(self, facts: Dict[str, Any]) -> str:
-        def fmt(v):
-            if isinstance(v, int):
-                return f"{v:,}".replace(',', ' ')
-            if isinstance(v, float):
-                sval = f"{v:.2f}".rstrip('0').rstrip('.')
-                return sval.replace('.', ',')
-            return str(v)
-        
-        # Make totals absolutely clear and never say zero if there are problems
-        prod_val = facts.get('produktion_kwh', 0)
-        rev_val = facts.get('intakter_sek', 0) 
-        
-        # Only show totals if they make sense with the negative data
-        if prod_val > 0 and 'timmar_arbetade_gratis' in facts:
-            bits = [f"Årsproduktion {fmt(prod_val)} kWh", f"totala intäkter {fmt(rev_val)} SEK"]
-        else:
-            bits = [f"Anläggning med produktion och intäkter enligt data"]
-        
-        # MARKET IMPACT METRICS - clearly mark these as negative-period only
-        if 'timmar_arbetade_gratis' in facts:
-            bits.append(f"{fmt(facts['timmar_arbetade_gratis'])} timmar utan marknadsetsättning")
-        if 'kwh_producerat_med_förlust' in facts:
-            bits.append(f"{fmt(facts['kwh_producerat_med_förlust'])} kWh producerat vid negativa priser")
-        if 'procent_produktion_bortkastad' in facts:
-            bits.append(f"{fmt(facts['procent_produktion_bortkastad'])}% av produktion vid olönsamma villkor")
-        if 'kostnad_negativa_priser_sek' in facts:
-            bits.append(f"kostnad för negativa priser {fmt(facts['kostnad_negativa_priser_sek'])} SEK")
-        if 'dagar_med_negativ_påverkan' in facts:
-            bits.append(f"drabbades {fmt(facts['dagar_med_negativ_påverkan'])} dagar av negativa priser")
-            
-        # OPTIMIZATION POTENTIAL
-        if 'zap_negativa_timmar' in facts:
-            bits.append(f"Exportstyrning kan optimera {fmt(facts['zap_negativa_timmar'])} timmar")
-        if 'zap_producerat_gratis_kwh' in facts:
-            bits.append(f"Styrning kan omdirigera {fmt(facts['zap_producerat_gratis_kwh'])} kWh")
-        if 'zap_dagar_drabbade' in facts:
-            bits.append(f"Påverkan kan minskas {fmt(facts['zap_dagar_drabbade'])} dagar")
-            
-        # Traditional metrics (lower priority)
-        if 'andel_neg_timmar_pct' in facts:
-            bits.append(f"{fmt(facts['andel_neg_timmar_pct'])}% timmar ≤0 SEK")
-        if 'timing_rabatt_pct' in facts:
-            bits.append(f"marknadstiming {fmt(facts['timing_rabatt_pct'])}% avvikelse")
-        if 'prisgolv_potential_sek' in facts:
-            bits.append(f"prisgolv potential +{fmt(facts['prisgolv_potential_sek'])} SEK")
-        if 'batt_delta_sek' in facts:
-            maybe_size = facts.get('batt_size_kwh')
-            size_str = f" ({maybe_size}kWh)" if maybe_size else ''
-            bits.append(f"batteri{size_str} +{fmt(facts['batt_delta_sek'])} SEK")
-        return '; '.join(bits)
-
-    def _build_prompt(self, bullet_line: str, facts: Dict[str, Any]) -> str:
-        # Create a professional and educational explanation
+        items = tuple(sorted((k, type(v), v) for k, v in facts.items()))
+        try:
+            return _facts_bullet(items)
+        except TypeError:  # unhashable value, format without caching
+            return _facts_bullet.__wrapped__(items)
+
+    def _build_instructions(self, facts: Dict[str, Any]) -> str:
         has_zap_data = 'zap_negativa_timmar' in facts or 'zap_producerat_gratis_kwh' in facts
-        
-        base_prompt = (
-            f"Skriv kort svensk analys (max 200 ord) för villaägare om solceller och negativa priser. "
-            f"Data: {bullet_line}. "
-            
-            "VIKTIGT: Negativa timmar/kWh är del av total produktion, inte hela. Säg aldrig '0 kWh totalt' om negativa perioder finns. "
-            "Förklara: 1) Negativa priser = systemöverskott, 2) Export kostar pengar, 3) 60-öringen upphör 2025/2026. "
-            "- 'Årsproduktion X kWh' och 'totala intäkter Y SEK' är separata från 'Z timmar utan ersättning under negativa priser' "
-            "- Negativa timmar/kWh är DELMÄNGD av total produktion, inte hela produktionen! "
-            
-            "STRUKTUR för analysen: "
-            "1. Börja med teknisk analys av marknadsvillkoren: "
-            "   - Förklara att negativa priser uppstår vid systemöverskott av förnybar energi "
-            "   - Kvantifiera påverkan: X timmar utan ersättning, Y kWh producerat vid olönsamma villkor "
-            "   - Marknadstiming visar systematisk avvikelse från optimala exporttidpunkter "
-            
-            "2. Förklara ekonomiska och systemmässiga konsekvenser: "
-            "   - Negativa priser innebär betalning för export eller noll-ersättning "
-            "   - Export vid överskott förvärrar elnätets obalans och driver ytterligare prisfall "
-            "   - VIKTIGT: Nämna att 60-öringen (skattereduktion) upphör 2025/2026, vilket gör negativa priser ännu mer kostsamma "
-            "   - Kommande effekttariffer kommer ytterligare best raffa export vid hög belastning "
-        )
-        
-        if has_zap_data:
-            base_prompt += (
-                "\n\n3. Avsluta med lösningen - intelligent exportstyrning: "
-                "   - Automatisk pausning av export vid negativa priser skyddar både ekonomi och nätstabilitet "
-                "   - Kvantifiera: X timmar och Y kWh kan optimeras bort från olönsam produktion "
-                "   - Systemet förbereder anläggningen för effekttariffer och framtida marknadsvillkor "
-                "   - Bidrar till ett stabilare elnät genom att minska överproduktion vid kritiska tidpunkter "
-            )
-        else:
-            base_prompt += (
-                "\n\n3. Avsluta med att intelligent exportstyrning kan optimera anläggningen för bättre marknadsvillkor och nätstabilitet. "
-            )
-        
-        base_prompt += "\nAnvänd endast faktiska data. Ton: saklig, professionell och utbildande utan säljtryck."
-        return base_prompt
+        return _INSTRUCTIONS_WITH_ZAP if has_zap_data else _INSTRUCTIONS_GENERIC
+
+    def _build_prompt(self, bullet_line: str) -> str:
+        return _PROMPT_INPUT.format(bullet=bullet_line)
 
     def _short_prompt(self, bullet_line: str) -> str:
-        return (
-            f"Kort teknisk analys (1 stycke, max 120 ord) av solcellsanläggning: {bullet_line}. "
-            "Tolkning: 'produktion' och 'intäkter' = totala värden, 'timmar utan ersättning' = negativa prisperioder. "
-            "Fokus: marknadsvillkor, systemöverskott, ekonomisk påverkan. "
-            "Nämn 60-öringens bortfall 2025/2026. Endast faktiska siffror."
-        )
+        return _SHORT_PROMPT.format(bullet=bullet_line)
+
+    def _get_api_key(self) -> Optional[str]:
+        # The key may be exported after construction; re-check only while unset
+        if not self.api_key:
+            self.api_key = os.getenv('OPENAI_API_KEY')
+        return self.api_key
 
     def _map_reason(self, reason: str) -> str:
-        if 'auth' in reason or '401' in reason:
-            return 'auth'
-        if '429' in reason or 'quota' in reason:
-            return 'kvot'
-        if 'model' in reason:
-            return 'modell'
-        if 'timeout' in reason.lower() or 'timed out' in reason.lower():
-            return 'timeout'
-        return reason
-
-    def _call_openai(self, prompt: str) -> str | None:
-        api_key = os.getenv('OPENAI_API_KEY')
-        if not api_key:
+        return _reason_label(reason)
+
+    def _call_openai(self, prompt: str, instructions: Optional[str] = None,
+                     timeout: Optional[float] = None) -> str | None:
+        if not self._get_api_key():
             return None
-        url = f"{self.base_url.rstrip('/')}/responses"
+        cache_key = hashlib.sha256(f"{self.model}\0{instructions or ''}\0{prompt}".encode('utf-8')).hexdigest()
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
         # Keep payload minimal for maximum compatibility (some deployments reject extra params)
         payload = {"model": self.model, "input": prompt}
-        headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-        timeout_s = float(os.getenv('OPENAI_TIMEOUT', '40'))
-        r = requests.post(url, headers=headers, data=json.dumps(payload), timeout=timeout_s)
+        if instructions:
+            payload["instructions"] = instructions
+        if self._headers is None:
+            self._headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+        r = _post(self._responses_url, self._headers, _json_dumps(payload), timeout or self.timeout_s)
         if r.status_code != 200:
             raise RuntimeError(f"HTTP {r.status_code}: {r.text[:180]}")
         try:
-            data = r.json()
+            data = _json_loads(r.content)
         except Exception as e:
             raise RuntimeError(f"JSON decode misslyckades: {e}")
-        if os.getenv('OPENAI_DEBUG_EXPLAINER') == '1':
+        if self.debug:
             logger.debug('HTTP JSON keys: %s', list(data.keys()))
-        output = data.get('output') or []
-        pieces: list[str] = []
-        for item in output:
-            if isinstance(item, dict) and item.get('type') == 'message':
-                for block in item.get('content', []) or []:
-                    if isinstance(block, dict):
-                        t = block.get('text')
-                        if isinstance(t, str):
-                            pieces.append(t)
-                        elif isinstance(t, dict):
-                            val = t.get('value') or t.get('text')
-                            if isinstance(val, str):
-                                pieces.append(val)
-            elif isinstance(item, dict) and item.get('type') in ('text','output_text'):
-                t = item.get('text')
-                if isinstance(t, str):
-                    pieces.append(t)
-        if not pieces and isinstance(data.get('output_text'), str):
-            pieces.append(data['output_text'])
-        text = '\n'.join(p.strip() for p in pieces if p and p.strip())
+        # The API usually assembles output_text server-side; only walk the
+        # output blocks when it is missing
+        output_text = data.get('output_text')
+        if isinstance(output_text, str) and output_text.strip():
+            text = output_text.strip()
+            llm_cache.set(cache_key, text)
+            return text
+        pieces = _iter_output_text(data.get('output') or ())
+        text = '\n'.join(p.strip() for p in pieces if type(p) is str and p.strip())
+        if text:
+            llm_cache.set(cache_key, text)
         return text or None
 
     def _manual_fallback(self, facts: Dict[str, Any], reason: str) -> str:
         """Produce a simple deterministic Swedish summary if AI fails."""
-        try:
-            prod = facts.get('produktion_kwh')
-            rev = facts.get('intakter_sek')
-            timmar_gratis = facts.get('timmar_arbetade_gratis')
-            kwh_förlust = facts.get('kwh_producerat_med_förlust')
-            kostnad = facts.get('kostnad_negativa_priser_sek')
-            zap_timmar = facts.get('zap_negativa_timmar')
-            zap_kwh = facts.get('zap_producerat_gratis_kwh')
-            
-            parts = [f"Anläggningen producerade {prod} kWh med totala intäkter {rev} SEK."]
-            
-            if timmar_gratis:
-                parts.append(f"Under {timmar_gratis} timmar erhölls ingen marknadsetsättning.")
-            if kwh_förlust:
-                parts.append(f"{kwh_förlust} kWh producerades vid negativa priser.")
-            if kostnad:
-                parts.append(f"Marknadspåverkan: -{kostnad} SEK.")
-                
-            if zap_timmar or zap_kwh:
-                if zap_timmar:
-                    parts.append(f"Exportstyrning kan optimera {zap_timmar} timmar.")
-                if zap_kwh:
-                    parts.append(f"Potential att omdirigera {zap_kwh} kWh.")
-            else:
-                parts.append("Intelligent styrning kan förbättra marknadsutfallet.")
-                
-            parts.append(f"(Reservförklaring – {reason})")
-            return ' '.join(parts)
-        except Exception:
-            return f"Förklaring misslyckades ({reason})."
+        parts = [f"Anläggningen producerade {facts.get('produktion_kwh')} kWh "
+                 f"med totala intäkter {facts.get('intakter_sek')} SEK."]
+        parts += [tmpl.format(facts[key]) for key, tmpl in _FALLBACK_SENTENCES if facts.get(key)]
+        if not any(facts.get(key) for key in _FALLBACK_ZAP_KEYS):
+            parts.append(_FALLBACK_NO_ZAP)
+        parts.append(f"({FALLBACK_MARKER} – {reason})")
+        return ' '.join(parts)
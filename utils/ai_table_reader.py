@@ -159,6 +159,7 @@ Return only valid JSON, no other text."""
                 df = pd.read_excel(
                     file_path,
                     engine='openpyxl',
+                    engine_kwargs={"read_only": True, "data_only": True, "keep_links": False},
                     header=header_row
                 )
             else:
@@ -191,6 +192,9 @@ Return only valid JSON, no other text."""
 
     def _read_preview(self, file_path: str) -> str:
         """Read first N lines of file for AI analysis."""
+        if file_path.lower().endswith(('.xlsx', '.xlsm')):
+            return self._read_excel_preview(file_path)
+
         try:
             # Try multiple encodings
             for enc in ("utf-8-sig", "utf-8", "cp1252", "iso-8859-1", "utf-16"):
@@ -214,6 +218,26 @@ Return only valid JSON, no other text."""
             logger.warning(f"Preview read failed: {e}")
             return ""
 
+    def _read_excel_preview(self, file_path: str) -> str:
+        """Stream the first N rows of the first sheet without loading the whole workbook."""
+        try:
+            from openpyxl import load_workbook
+
+            wb = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+            try:
+                ws = wb.worksheets[0]
+                lines = []
+                for i, row in enumerate(ws.iter_rows(max_row=self.max_preview_lines, values_only=True)):
+                    cells = ["" if v is None else str(v) for v in row]
+                    lines.append(f"[{i}] {';'.join(cells).rstrip(';')}")
+                return "\n".join(lines)
+            finally:
+                wb.close()
+
+        except Exception as e:
+            logger.warning(f"Excel preview read failed: {e}")
+            return ""
+
     def _extract_json(self, text: str) -> str:
         """Extract JSON object from text (handles markdown code blocks)."""
         # Remove markdown code blocks if present
@@ -15,18 +15,7 @@ class CSVFormatDetectorFallback:
 
     def detect_format(self, file_path):
         """Detect CSV format using traditional methods."""
-        encoding = self._detect_encoding(file_path)
-        separator = self._detect_separator(file_path, encoding)
-
-        test_params = {
-            'sep': separator or ';',
-            'encoding': (encoding or 'utf-8-sig'),
-            'na_values': ['', 'NA', 'N/A', 'null', 'NULL', 'None', '-'],
-            'thousands': None,
-            'decimal': ',' if separator == ';' else '.',
-            'skipinitialspace': True,
-            'quotechar': '"',
-        }
+        test_params = self._detect_params(file_path)
 
         try:
             df_test = pd.read_csv(file_path, nrows=5, **test_params)
@@ -38,9 +27,27 @@ class CSVFormatDetectorFallback:
 
     def read(self, file_path):
         """Read CSV with detected format parameters."""
-        params = self.detect_format(file_path)
+        # The full read raises the same errors as a trial parse would, so the
+        # 5-row validation in detect_format is skipped here.
+        params = self._detect_params(file_path)
+        logger.info(f"Detected format: {params}")
         return pd.read_csv(file_path, **params)
 
+    def _detect_params(self, file_path):
+        """Build read_csv parameters from the detected encoding and separator."""
+        encoding = self._detect_encoding(file_path)
+        separator = self._detect_separator(file_path, encoding)
+
+        return {
+            'sep': separator or ';',
+            'encoding': (encoding or 'utf-8-sig'),
+            'na_values': ['', 'NA', 'N/A', 'null', 'NULL', 'None', '-'],
+            'thousands': None,
+            'decimal': ',' if separator == ';' else '.',
+            'skipinitialspace': True,
+            'quotechar': '"',
+        }
+
     def _detect_encoding(self, file_path):
         """Detect file encoding."""
         try:
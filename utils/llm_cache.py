@@ -0,0 +1,121 @@
+"""
+Cache for AI explanation texts.
+
+Only active with OPENAI_CACHE=1. Entries then live in a process-wide LRU
+and are written through to a small sqlite file (OPENAI_CACHE_PATH, default
+~/.cache/negprice/ai_explain.sqlite). Both are read back for
+OPENAI_CACHE_TTL seconds (default 24h), so repeated CLI runs skip the API
+call; expired rows are deleted on write.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from pathlib import Path
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_ENTRIES = 512
+DEFAULT_TTL = 86400
+
+# key -> (value, unix timestamp when stored)
+_memory: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+_lock = threading.Lock()
+_initialised_paths = set()
+
+
+def _enabled() -> bool:
+    return os.getenv('OPENAI_CACHE') == '1'
+
+
+def _disk_path() -> Optional[Path]:
+    if not _enabled():
+        return None
+    override = os.getenv('OPENAI_CACHE_PATH')
+    return Path(override).expanduser() if override else Path.home() / '.cache' / 'negprice' / 'ai_explain.sqlite'
+
+
+def _ttl() -> int:
+    try:
+        return int(os.getenv('OPENAI_CACHE_TTL', DEFAULT_TTL))
+    except ValueError:
+        return DEFAULT_TTL
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    if path not in _initialised_paths:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(sqlite3.connect(path)) as conn, conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    ts INTEGER NOT NULL
+                )
+            ''')
+        _initialised_paths.add(path)
+    return sqlite3.connect(path)
+
+
+def _remember(key: str, value: str, ts: int) -> None:
+    with _lock:
+        _memory[key] = (value, ts)
+        _memory.move_to_end(key)
+        while len(_memory) > MAX_ENTRIES:
+            _memory.popitem(last=False)
+
+
+def get(key: str) -> Optional[str]:
+    """Return the cached text for key, or None (always None unless OPENAI_CACHE=1)."""
+    if not _enabled():
+        return None
+    oldest = int(time.time()) - _ttl()
+    with _lock:
+        entry = _memory.get(key)
+        if entry is not None:
+            if entry[1] >= oldest:
+                _memory.move_to_end(key)
+                return entry[0]
+            del _memory[key]
+
+    path = _disk_path()
+    try:
+        # closing() releases the handle; the inner `with conn` only commits
+        with closing(_connect(path)) as conn, conn:
+            row = conn.execute(
+                'SELECT value, ts FROM responses WHERE key = ? AND ts >= ?',
+                (key, oldest)
+            ).fetchone()
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"Could not read AI response cache: {e}")
+        return None
+    if row is None:
+        return None
+    _remember(key, row[0], row[1])
+    return row[0]
+
+
+def set(key: str, value: str) -> None:
+    """Store value under key, in memory and on disk (no-op unless OPENAI_CACHE=1)."""
+    if not _enabled():
+        return
+    now = int(time.time())
+    _remember(key, value, now)
+
+    path = _disk_path()
+    try:
+        with closing(_connect(path)) as conn, conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO responses (key, value, ts) VALUES (?, ?, ?)',
+                (key, value, now)
+            )
+            # Keep the file from growing without bound
+            conn.execute('DELETE FROM responses WHERE ts < ?', (now - _ttl(),))
+    except (sqlite3.Error, OSError) as e:
+        # Caching is best-effort
+        logger.warning(f"Could not write AI response cache: {e}")